@@ -1,16 +1,22 @@
 import streamlit as st
 import pandas as pd
 import io
-import collections
 import numpy as np
 import altair as alt
-from joblib import Parallel, delayed, cpu_count
+from joblib import cpu_count
 import sys
 import os
 import traceback
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import utils
+import quota_cache
+import quota_cli
+import quota_engine
+import quota_exact
+import quota_report
+import quota_scoring
 
 st.set_page_config(page_title="쿼터 솔루션", layout="wide")
 
@@ -31,6 +37,81 @@ def normalize_val(val):
         s = s[:-2]
     return s
 
+def tier_input(key):
+    """쿼터 등급 선택: 하드 = 0, 소프트 = 우선순위 (1 이 가장 중요)"""
+    t1, t2 = st.columns([2, 1])
+    with t1:
+        soft = st.radio("쿼터 등급", ["하드 (반드시 준수)", "소프트 (가능한 만큼)"], horizontal=True, key=f"tier_{key}").startswith("소프트")
+    with t2:
+        prio = st.number_input("소프트 우선순위 (1 = 가장 중요)", 1, 9, 1, key=f"prio_{key}", disabled=not soft)
+    return int(prio) if soft else 0
+
+# ==============================================================================
+# [결과 시각화] 차트 데이터는 셀 수와 무관하게 상한 이내로 유지
+# ==============================================================================
+MAX_BAR_CELLS = 40        # 이하이면 전체 셀 막대 차트
+MAX_HEATMAP_CELLS = 2500  # 히트맵 행 x 열 상한 (넘으면 드릴다운 안내)
+
+def bar_chart(status):
+    """목표 / 달성 막대 차트 (status 는 이미 표시 순서로 정렬됨)"""
+    chart_data = status[['항목', '목표', '달성']].rename(columns={'목표': '1.목표', '달성': '2.달성'}) \
+        .melt(id_vars='항목', var_name='Type', value_name='Value')
+    return alt.Chart(chart_data).mark_bar().encode(
+        y=alt.Y('항목:N', axis=alt.Axis(title=None), sort=status['항목'].tolist()),
+        x=alt.X('Value:Q', axis=alt.Axis(title='인원수')),
+        color=alt.Color('Type:N', scale=alt.Scale(domain=['1.목표', '2.달성'], range=['#e0e0e0', '#4c78a8']), legend=alt.Legend(title="구분")),
+        yOffset='Type:N'
+    ).properties(height=max(300, len(status)*25))
+
+def heatmap_chart(hm, row_dim, col_dim):
+    """두 차원 교차 달성률 히트맵 (색 = 달성률, 툴팁 = 목표 / 달성 / 부족)"""
+    rows = sorted(hm[row_dim].unique(), key=utils.natural_key)
+    cols = sorted(hm[col_dim].unique(), key=utils.natural_key)
+    return alt.Chart(hm).mark_rect().encode(
+        y=alt.Y(field=row_dim, type='nominal', sort=rows),
+        x=alt.X(field=col_dim, type='nominal', sort=cols),
+        color=alt.Color(field='달성률(%)', type='quantitative', scale=alt.Scale(domain=[0, 100], scheme='redyellowgreen', clamp=True)),
+        tooltip=[alt.Tooltip(field=c, type='nominal') for c in (row_dim, col_dim)] +
+                [alt.Tooltip(field=c, type='quantitative') for c in ('목표', '달성', '부족', '달성률(%)')]
+    ).properties(height=max(200, min(len(rows), 60)*22))
+
+def quota_view(key, status, dims):
+    """탭 1개: 요약 지표 + (작으면 막대 / 크면 히트맵 드릴다운) + 부족 상위 목록"""
+    c1, c2, c3 = st.columns(3)
+    c1.metric("셀 수", f"{len(status):,}개")
+    c2.metric("미달 셀", f"{int((status['부족'] > 0).sum()):,}개")
+    c3.metric("부족 합계", f"{int(status['부족'].sum()):,}명")
+
+    if len(status) <= MAX_BAR_CELLS:
+        st.altair_chart(bar_chart(status), use_container_width=True)
+    elif dims and len(dims) >= 2:
+        h1, h2 = st.columns(2)
+        row_dim = h1.selectbox("히트맵 행", dims, index=0, key=f"hm_row_{key}")
+        col_dim = h2.selectbox("히트맵 열", [d for d in dims if d != row_dim], index=0, key=f"hm_col_{key}")
+        filters = {}
+        others = [d for d in dims if d not in (row_dim, col_dim)]
+        if others:
+            f_cols = st.columns(len(others))
+            for fc, d in zip(f_cols, others):
+                val = fc.selectbox(f"{d} 선택", ["(전체)"] + sorted(status[d].unique(), key=utils.natural_key), key=f"hm_f_{key}_{d}")
+                if val != "(전체)":
+                    filters[d] = val
+        hm = quota_report.heatmap_frame(status, row_dim, col_dim, filters)
+        if len(hm) > MAX_HEATMAP_CELLS:
+            st.info(f"히트맵 칸이 너무 많습니다 ({len(hm):,}개). 행/열을 값이 적은 차원으로 바꾸거나 다른 차원을 선택해 범위를 좁히세요.")
+        else:
+            st.altair_chart(heatmap_chart(hm, row_dim, col_dim), use_container_width=True)
+
+    if not (status['부족'] > 0).any():
+        st.success("모든 셀이 목표를 달성했습니다.")
+        return
+    top_n = st.slider("부족 상위 셀 수", 5, 100, 20, step=5, key=f"top_{key}")
+    short = quota_report.top_shortfalls(status, top_n)
+    if len(status) > MAX_BAR_CELLS and not (dims and len(dims) >= 2):
+        # 1차원 대형 그룹: 전체 막대 대신 부족 상위 셀만 막대로
+        st.altair_chart(bar_chart(short), use_container_width=True)
+    st.dataframe(short, use_container_width=True, hide_index=True)
+
 # ==============================================================================
 # 1. 데이터 업로드
 # ==============================================================================
@@ -39,43 +120,43 @@ data_file = st.file_uploader("설문 데이터", type=['csv', 'xlsx'], key="quot
 
 if data_file:
     df_survey = utils.load_df(data_file)
+    data_sig = utils.file_signature(data_file)   # 설정 표 캐시 키
+    # 컬럼별 정규화 결과 (설정 표와 키 추출이 공유, 데이터가 바뀌면 초기화)
+    norm_cache = st.session_state.get('quota_norm')
+    if norm_cache is None or norm_cache['sig'] != data_sig:
+        norm_cache = st.session_state['quota_norm'] = {'sig': data_sig, 'cols': {}}
+    col_cache = norm_cache['cols']
     st.success(f"로드 완료: {len(df_survey)}명")
     st.divider()
 
     st.subheader("2. 쿼터 설정")
     use_main = st.checkbox("✅ 메인 쿼터 사용", value=True)
-    main_map = {}; algo_main_cols = []
+    main_map = {}; algo_main_cols = []; main_tier = 0
     
     if use_main:
+        main_tier = tier_input("main")
         q_mode = st.radio("메인 쿼터 방식", ["엑셀 업로드", "화면 설계"], horizontal=True)
         if q_mode == "엑셀 업로드":
             qf = st.file_uploader("쿼터 파일", type=['xlsx'])
-            c1,c2,c3 = st.columns(3)
-            with c1: q1=st.selectbox("qt1", df_survey.columns)
-            with c2: q2=st.selectbox("qt2", df_survey.columns)
-            with c3: q3=st.selectbox("qt3", df_survey.columns)
+            n_dims = int(st.number_input("키 열 수 (쿼터 파일의 목표 열 앞 열 개수)", 1, 8, 3))
+            q_cols = st.columns(n_dims)
+            q_sel = []
+            for d, c in enumerate(q_cols):
+                with c: q_sel.append(st.selectbox(f"qt{d+1}", df_survey.columns, key=f"qt_{d}"))
             if qf:
-                algo_main_cols=[q1,q2,q3]
+                algo_main_cols=q_sel
                 try:
                     raw = pd.read_excel(qf,0,header=None)
-                    flat = utils.transform_pivoted_quota(raw)
                     # 쿼터 키 정규화
-                    main_map = {
-                        tuple(normalize_val(v) for v in (r.qt1, r.qt2, r.qt3)): r.target 
-                        for r in flat.itertuples()
-                    }
+                    main_map = quota_cli.main_map_from_sheet(raw, n_dims)
+                    if not main_map: st.error(f"쿼터 파일에 키 열 {n_dims}개 + 목표 열이 없습니다.")
                 except: st.error("엑셀 오류")
         else:
             rv = st.multiselect("행(Row) 변수", df_survey.columns)
             cv = st.selectbox("열(Col) 변수", ["(선택)"]+list(df_survey.columns))
             if rv and cv!="(선택)":
                 algo_main_cols = rv+[cv]
-                base = df_survey.copy()
-                for c in algo_main_cols:
-                    base[c]=base[c].apply(utils.clean_val)
-                    uv=sorted(base[c].unique(), key=utils.natural_key)
-                    base[c]=pd.Categorical(base[c], categories=uv, ordered=True)
-                pi = base.groupby(algo_main_cols, observed=False).size().unstack(fill_value=0)
+                pi = utils.grid_counts(data_sig, df_survey, tuple(algo_main_cols), col_cache)
                 ed = st.data_editor(pi.reset_index(), use_container_width=True, disabled=rv)
                 mlt = ed.melt(id_vars=rv, var_name=cv, value_name='target')
                 for _,r in mlt.iterrows():
@@ -98,7 +179,7 @@ if data_file:
         with tab:
             ex_mode = st.radio(f"설정 방식 (그룹 {i+1})", ["단순형 (변수 값별 할당)", "조합형 (행/열 교차 할당)"], key=f"ex_mode_{i}", horizontal=True)
             
-            config = {'cols': [], 'map': {}, 'name': f"Extra_{i+1}", 'mode': 'simple'}
+            config = {'cols': [], 'map': {}, 'name': f"Extra_{i+1}", 'mode': 'simple', 'tier': tier_input(i)}
             
             if ex_mode.startswith("단순형"):
                 config['mode'] = 'simple'
@@ -108,16 +189,8 @@ if data_file:
                     auto_name = "_".join([str(c) for c in cols])
                     config['name'] = utils.sanitize_sheet_name(auto_name)
                     
-                    vals = []
-                    for _, r in df_survey[cols].fillna("").iterrows(): 
-                        raw_vals = utils.collect_values_from_cols(r, cols)
-                        norm_vals = [normalize_val(v) for v in raw_vals]
-                        vals.extend(norm_vals)
-
-                    cnt = pd.DataFrame.from_dict(collections.Counter(vals), orient='index', columns=['현재']).reset_index()
-                    cnt.columns=['값','현재']; cnt['목표']=cnt['현재']
-                    cnt['srt']=cnt['값'].apply(utils.natural_key)
-                    ed = st.data_editor(cnt.sort_values('srt').drop(columns=['srt']), use_container_width=True, key=f"ed{i}")
+                    cnt = utils.simple_counts(data_sig, df_survey, tuple(cols), col_cache)
+                    ed = st.data_editor(cnt, use_container_width=True, key=f"ed{i}")
                     for _,r in ed.iterrows(): 
                         if r['목표']>0: 
                             config['map'][normalize_val(r['값'])]=int(r['목표'])
@@ -134,13 +207,7 @@ if data_file:
                     auto_name = "_".join([str(c) for c in target_cols])
                     config['name'] = utils.sanitize_sheet_name(auto_name)
                     
-                    base = df_survey.copy()
-                    for c in target_cols:
-                        base[c] = base[c].apply(utils.clean_val)
-                        uv = sorted(base[c].unique(), key=utils.natural_key)
-                        base[c] = pd.Categorical(base[c], categories=uv, ordered=True)
-                    
-                    pi = base.groupby(target_cols, observed=False).size().unstack(fill_value=0)
+                    pi = utils.grid_counts(data_sig, df_survey, tuple(target_cols), col_cache)
                     ed = st.data_editor(pi.reset_index(), use_container_width=True, disabled=ex_rv, key=f"ex_ed_grid_{i}")
                     
                     mlt = ed.melt(id_vars=ex_rv, var_name=ex_cv, value_name='target')
@@ -154,160 +221,238 @@ if data_file:
 
             ex_configs.append(config)
 
+    # 그룹별 등급 [메인, 추가 1..6] - 소프트 그룹이 있으면 하드 충족 우선, 소프트 충족 차선으로 최적화
+    group_tiers = [main_tier] + [cfg['tier'] if cfg['cols'] else 0 for cfg in ex_configs]
+    has_soft = any(group_tiers)
+
     st.divider()
     st.subheader("3. 실행 옵션")
     c1, c2 = st.columns(2)
     with c1:
         c_no = st.selectbox("ID 컬럼", df_survey.columns)
         tol = st.number_input("허용 오차", 0, 100, 0)
+        seed_in = st.number_input("난수 시드 (0 = 자동 생성)", 0, 2**31 - 1, 0,
+                                  help="같은 데이터와 시드로 '시도 횟수' 기준 실행 시 같은 결과가 나옵니다 (시드를 지정하면 웜 스타트 없이 처음부터 계산). 사용된 시드는 결과 파일 Run_Info 시트에 기록됩니다.")
     with c2:
-        iters = st.number_input("시도 횟수", 100, 1000000, 10000, 1000)
-        use_intval = st.checkbox("intval 최적화", value=True)
+        stop_mode = st.radio("탐색 종료 기준", ["시도 횟수", "시간 제한"], horizontal=True)
+        if stop_mode == "시도 횟수":
+            iters = st.number_input("시도 횟수", 100, 1000000, 10000, 1000); time_budget = None
+        else:
+            time_budget = st.number_input("탐색 시간(초)", 5, 3600, 30, 5); iters = 0
+        use_intval = st.checkbox("intval 최적화", value=True,
+                                 help="희소성이 같은 응답자(소속 셀이 같은 응답자) 중 intval 우선순위가 높은 응답자를 먼저 선택합니다.")
         c_int = st.selectbox("intval 컬럼", df_survey.columns) if use_intval else None
+        int_high_first = st.radio("intval 우선순위", ["높은 값 우선", "낮은 값 우선"], horizontal=True) == "높은 값 우선" if use_intval else True
+    with st.expander("🔒 고정 포함 / 제외 응답자"):
+        st.caption("ID 컬럼 값 기준입니다. 이전 웨이브에서 납품한 응답자는 고정 포함, 불성실 에디터에서 걸러낸 ID 등은 제외하세요. "
+                   "쉼표/줄바꿈으로 구분해 입력하거나 첫 번째 컬럼에 ID가 있는 파일을 올립니다.")
+        l1, l2 = st.columns(2)
+        with l1:
+            inc_text = st.text_area("고정 포함 ID", key="lock_in")
+            inc_file = st.file_uploader("고정 포함 ID 파일", type=['csv', 'xlsx'], key="lock_in_file")
+        with l2:
+            exc_text = st.text_area("제외 ID", key="lock_ex")
+            exc_file = st.file_uploader("제외 ID 파일", type=['csv', 'xlsx'], key="lock_ex_file")
+        include_ids = quota_cli.parse_id_text(inc_text) + (utils.load_df(inc_file).iloc[:, 0].dropna().tolist() if inc_file else [])
+        exclude_ids = quota_cli.parse_id_text(exc_text) + (utils.load_df(exc_file).iloc[:, 0].dropna().tolist() if exc_file else [])
+    exec_mode = st.radio("병렬 방식", ["스레드", "프로세스 (멀티코어)"], horizontal=True,
+                         help="프로세스 방식은 코어마다 독립 프로세스로 실행되어 GIL 제약 없이 확장됩니다.")
+    backend = "processes" if exec_mode.startswith("프로세스") else "threads"
+    solver_mode = st.radio("솔버 방식", ["랜덤 그리디 (Turbo)", "정확해 (최대유량 / 분기한정)"], horizontal=True,
+                           help="정확해는 가능한 최대 매칭 수를 계산하며, 시간 제한에 걸리면 상한과 함께 현재 최선해를 반환합니다. "
+                                "복수응답에 같은 키가 겹치는 응답자가 있으면 목표를 넘기지 않는 기준으로 풀어 그리디보다 적을 수 있습니다.")
+    use_exact = solver_mode.startswith("정확해")
+    exact_limit = st.number_input("정확해 시간 제한(초)", 5, 3600, 60, 5) if use_exact else None
+    use_repair = False if use_exact else st.checkbox("🔧 로컬 서치 보정 (스왑 개선)", value=True,
+                                                     help="그리디 최고 결과에서 1-for-1 / 2-for-1 교체로 막힌 셀을 풀어 추가 매칭을 시도합니다.")
+    use_explain = st.checkbox("🧭 목표 미달 시 병목 진단", value=True,
+                              help="LP 쌍대가격으로 부족 셀과 경합하는 셀, 추가 모집 시 늘어나는 달성 수를 계산합니다.")
+
+    # 같은 데이터(내용 해시)/변수 구성이면 키, 인코딩, 직전 결과를 재사용 (목표만 수정한 재계산)
+    setup_sig = (
+        data_sig, use_main, tuple(algo_main_cols),
+        tuple((cfg['mode'], tuple(cfg['cols'])) for cfg in ex_configs)
+    )
+    use_cache = st.checkbox("💾 결과 캐시 사용", value=True,
+                            help="시도 횟수 기준으로 시드를 지정한 실행(또는 정확해)은 같은 데이터 / 목표 / 옵션으로 이미 계산한 결과가 있으면 (새로고침 후에도) 바로 표시합니다. 시드를 지정하지 않으면 같은 데이터의 최근 결과에서 이어서 계산합니다.")
+    # 자동 시드 실행은 다시 누를 때마다 새로 탐색 - 요청한 경우에만 저장 결과 사용 (이때는 웜 스타트 없이 계산해 같은 키로 저장)
+    reuse_auto = st.checkbox("💾 자동 시드 실행도 저장된 결과 사용", value=False,
+                             help="같은 데이터 / 목표 / 옵션의 저장 결과가 있으면 다시 탐색하지 않고 바로 표시합니다.") if use_cache and not use_exact and not seed_in else False
+    last_run = st.session_state.get('quota_last')
+    # 웜 스타트 결과는 직전 실행에 따라 달라지므로 시드를 지정한 (재현용) 실행에서는 사용하지 않음
+    can_warm = not use_exact and not has_soft and not seed_in and not reuse_auto and last_run is not None and last_run['sig'] == setup_sig
+    if use_exact and has_soft:
+        st.info("ℹ️ 정확해 모드에서는 소프트 그룹도 하드 쿼터로 계산합니다.")
+    use_warm = st.checkbox("♻️ 직전 결과에서 이어서 계산 (웜 스타트)", value=True,
+                           help="바뀐 목표의 영향을 받는 응답자만 빼거나 추가하고 보정 단계부터 다시 시작합니다.") if can_warm else False
 
     if st.button("🚀 매칭 시작 (Turbo)", type="primary"):
         if not main_map: st.error("목표 없음"); st.stop()
+        include_pos, miss_in = quota_cli.id_positions(df_survey, c_no, include_ids)
+        exclude_pos, miss_ex = quota_cli.id_positions(df_survey, c_no, exclude_ids)
+        if set(include_pos) & set(exclude_pos): st.error("고정 포함과 제외에 같은 응답자가 있습니다."); st.stop()
+        if miss_in or miss_ex:
+            st.warning(f"데이터에 없는 ID {len(miss_in) + len(miss_ex)}개는 무시합니다: {', '.join((miss_in + miss_ex)[:10])}")
         
         try:
             with st.spinner("종합 희소성 계산 및 병렬 연산 중..."):
-                df_proc = df_survey.copy()
-                
-                # [버그 수정] utils.clean_val을 유지하면서 안전하게 normalize_val 적용
-                if use_main:
-                    for c in algo_main_cols: 
-                        df_proc[c] = df_proc[c].apply(utils.clean_val).apply(normalize_val)
-                    m_keys = list(zip(*[df_proc[c] for c in algo_main_cols]))
-                else: 
-                    m_keys = [('All',) for _ in range(len(df_proc))]
-
-                ex_keys_list = []
-                for cfg in ex_configs:
-                    if not cfg['cols']:
-                        ex_keys_list.append([[] for _ in range(len(df_proc))])
-                        continue
-                        
-                    if cfg['mode'] == 'simple':
-                        # [버그 수정] utils.collect_values_from_cols 복구 (다중응답 쪼개기 기능 등 유지)
-                        keys = df_proc.apply(
-                            lambda r: [normalize_val(v) for v in utils.collect_values_from_cols(r, cfg['cols'])], 
-                            axis=1
-                        ).tolist()
-                    else:
-                        for c in cfg['cols']: 
-                            df_proc[c] = df_proc[c].apply(utils.clean_val).apply(normalize_val)
-                        tuples = list(zip(*[df_proc[c] for c in cfg['cols']]))
-                        keys = [[t] for t in tuples]
-                    ex_keys_list.append(keys)
+                # 키 추출/점수 계산은 컬럼 단위로만 읽으므로 복사하지 않음
+                df_proc = df_survey
+
+                # 정규화 키 (1, 1.0, "1" 통일) - 컬럼 단위 벡터화
+                cached_keys = st.session_state.get('quota_keys')
+                if cached_keys is not None and cached_keys['sig'] == setup_sig:
+                    m_keys, ex_keys_list = cached_keys['m_keys'], cached_keys['ex_keys_list']
+                else:
+                    m_keys = quota_scoring.extract_main_keys(df_proc, algo_main_cols if use_main else [], col_cache)
+                    ex_keys_list = [quota_scoring.extract_extra_keys(df_proc, cfg, col_cache) for cfg in ex_configs]
+                    st.session_state['quota_keys'] = {'sig': setup_sig, 'm_keys': m_keys, 'ex_keys_list': ex_keys_list}
 
                 target_total = sum(main_map.values())
                 soft_target = target_total - tol
+
+                # 고정 포함 / 제외: 포함 인원은 목표에서 한 번만 미리 빼고, 탐색은 남은 응답자로만 수행
+                s_index, s_m_keys, s_ex_keys = df_proc.index, m_keys, ex_keys_list
+                s_main_map, s_ex_maps = main_map, [cfg['map'] for cfg in ex_configs]
+                locks = None; locked_labels = []
+                if include_pos or exclude_pos:
+                    locks = quota_engine.apply_locks(m_keys, ex_keys_list, s_main_map, s_ex_maps, include_pos, exclude_pos)
+                    s_index = df_proc.index[locks['keep']]
+                    s_m_keys, s_ex_keys = locks['m_keys'], locks['ex_keys_list']
+                    s_main_map, s_ex_maps = locks['main_map'], locks['ex_maps_list']
+                    locked_labels = [int(idx) for idx in df_proc.index[locks['locked']]]
+                    st.caption(f"🔒 고정 포함 {len(locked_labels):,}명 / 제외 {len(exclude_pos):,}명")
+                    if locks['over']:
+                        st.warning(f"⚠️ 고정 포함 응답자만으로 목표를 넘는 셀이 {len(locks['over'])}개 있습니다.")
+                n_locked = len(locked_labels)
                 
                 # Score Calculation
-                m_cnt = collections.Counter(m_keys)
-                if use_main:
-                    score_main = np.array([m_cnt.get(k,0)/main_map.get(k,1) if main_map.get(k,0)>0 else 999 for k in m_keys])
+                final_scarcity_scores = quota_scoring.scarcity_scores(
+                    s_m_keys, s_ex_keys, s_main_map, s_ex_maps, use_main=use_main
+                )
+                if use_intval:
+                    # intval 보조 우선순위를 정렬 키에 접어 넣음 (동점 처리용)
+                    prio = df_proc[c_int] if locks is None else df_proc[c_int].to_numpy()[locks['keep']]
+                    final_scarcity_scores = quota_scoring.with_priority(final_scarcity_scores, prio, int_high_first)
+
+                # 셀 인코딩 / 클래스 압축: 목표 키 구성이 같으면 재사용하고 목표 용량과 점수만 다시 반영
+                enc_sig = (setup_sig, tuple(include_pos), tuple(exclude_pos), tuple(s_main_map), tuple(tuple(m) for m in s_ex_maps))
+                cached_enc = st.session_state.get('quota_enc')
+                if cached_enc is not None and cached_enc['sig'] == enc_sig:
+                    enc = quota_engine.with_caps(cached_enc['enc'], s_main_map, s_ex_maps)
+                    cls = quota_engine.reorder_classes(cached_enc['cls'], final_scarcity_scores)
                 else:
-                    score_main = np.ones(len(df_proc))
-
-                score_extras = np.zeros(len(df_proc))
-                for j, cfg in enumerate(ex_configs):
-                    if not cfg['cols']: continue
-                    all_vals = []
-                    for keys in ex_keys_list[j]: all_vals.extend(keys)
-                    ex_cnt_total = collections.Counter(all_vals)
-                    row_scores = []
-                    ex_map = cfg['map']
-                    for keys in ex_keys_list[j]:
-                        if not keys: row_scores.append(1.0); continue
-                        s_vals = []
-                        for k in keys:
-                            if k in ex_map and ex_map[k] > 0: s_vals.append(ex_cnt_total[k] / ex_map[k])
-                            else: s_vals.append(999)
-                        row_scores.append(min(s_vals))
-                    score_extras += np.array(row_scores)
-                
-                final_scarcity_scores = score_main + score_extras
-                
-                # Parallel
-                ipc = max(1, iters // n_cores)
-                res = Parallel(n_jobs=-1, backend="threading")(delayed(utils.simulation_worker)(
-                    i, ipc, df_proc.index.to_numpy(), final_scarcity_scores, m_keys, ex_keys_list, main_map, [c['map'] for c in ex_configs], soft_target
-                ) for i in range(n_cores))
+                    enc = quota_engine.encode_quota(s_m_keys, s_ex_keys, s_main_map, s_ex_maps)
+                    cls = quota_engine.compress_classes(enc['indptr'], enc['cells'], final_scarcity_scores)
+                    st.session_state['quota_enc'] = {'sig': enc_sig, 'enc': enc, 'cls': cls}
+
+                # 웜 스타트: 이번 세션의 직전 결과, 없으면 (시드 미지정 시) 캐시에 남은 같은 데이터의 최근 결과
+                c_data = quota_cache.data_key(s_index, s_m_keys, s_ex_keys) if use_cache else None
+                warm_labels = last_run['labels'] if use_warm else None
+                if warm_labels is None and use_cache and not use_exact and not seed_in and not reuse_auto and not has_soft:
+                    prev = quota_cache.get_latest(c_data)
+                    warm_labels = prev['labels'] if prev else None
+
+                # 결과 캐시: 키/점수/목표/옵션 해시가 같으면 저장된 결과 사용 (웜 스타트 결과는 별도 키)
+                cache_hit = None
+                if use_cache:
+                    c_params = quota_cache.solver_params(
+                        use_exact, iters, time_budget, exact_limit, tol, use_repair, int(seed_in) or None, n_cores, group_tiers,
+                        warm=warm_labels is not None)
+                    c_key = quota_cache.result_key(c_data, final_scarcity_scores, s_main_map, s_ex_maps, {**c_params, 'locked': tuple(locked_labels)})
+                    # 시간 제한 실행은 같은 시드라도 결과가 달라지므로 자동 시드 재사용을 켰을 때만 재사용
+                    if use_exact or quota_engine.reproducible_run(c_params['seed'], time_budget) or reuse_auto:
+                        cache_hit = quota_cache.get(c_data, c_key)
+
+                # 사전 진단: 셀별 가용 인원 + 유량 완화 상한 (탐색 목표를 상한으로 제한)
+                pre_t0 = time.time()
+                if cache_hit:
+                    pre = cache_hit['pre']
+                else:
+                    pre = quota_exact.precheck(final_scarcity_scores, s_m_keys, s_ex_keys, s_main_map, s_ex_maps, None if use_exact else group_tiers,
+                                               enc=enc, cls=cls)
+                    pre = {**pre, 'bound': pre['bound'] + n_locked}
+                pre_ms = (time.time() - pre_t0) * 1000
+                search_target = max(0, min(soft_target, pre['bound']) - n_locked)
+                if pre['bound'] < soft_target:
+                    st.warning(f"⚠️ 사전 진단 ({pre_ms:.0f}ms): 달성 가능 상한 **{pre['bound']:,}명** < 목표 {soft_target:,}명 - 상한에 도달하면 탐색을 즉시 종료합니다.")
+                    if pre['short_cells']:
+                        group_names = ['메인 쿼터'] + [cfg['name'] for cfg in ex_configs]
+                        st.dataframe(pd.DataFrame([
+                            {'구분': group_names[c['group']], '항목': " / ".join(c['key']) if isinstance(c['key'], tuple) else c['key'],
+                             '목표': c['target'], '가용': c['available'], '부족': c['target'] - c['available']}
+                            for c in pre['short_cells']
+                        ]), use_container_width=True, hide_index=True)
+                else:
+                    st.caption(f"✅ 사전 진단 ({pre_ms:.0f}ms): 달성 가능 상한 {pre['bound']:,}명")
                 
-                g_best_cnt = 0; g_best_idxs = []
-                for c, ixs in res:
-                    if c > g_best_cnt: g_best_cnt=c; g_best_idxs=ixs
+                exact_info = None
+                run_seed = int(seed_in) if seed_in else int(np.random.SeedSequence().entropy % (2**31 - 1)) + 1
+                warm_used = warm_labels is not None
+                if cache_hit:
+                    g_best_cnt, g_best_idxs = cache_hit['count'], cache_hit['labels']
+                    exact_info, run_seed, warm_used = cache_hit['exact_info'], cache_hit['seed'], cache_hit.get('warm', False)
+                    st.caption("💾 저장된 결과를 불러왔습니다 (같은 데이터 / 목표 / 옵션)")
+                elif use_exact:
+                    g_best_cnt, g_best_idxs, exact_info = quota_exact.solve_exact(
+                        s_index.to_numpy(), final_scarcity_scores, s_m_keys, s_ex_keys, s_main_map, s_ex_maps, time_limit=exact_limit,
+                        enc=enc, cls=cls
+                    )
+                    exact_info = {**exact_info, 'bound': exact_info['bound'] + n_locked}
+                else:
+                    # 실시간 진행 상황 (워커들이 공유 저장소에 게시한 최고 기록)
+                    live_box = st.empty()
+                    history = []
+                    def on_progress(elapsed, best, done):
+                        best += n_locked
+                        history.append({'경과(초)': round(elapsed, 1), '달성률(%)': best / max(target_total, 1) * 100})
+                        with live_box.container():
+                            st.progress(min(1.0, best / max(soft_target, 1)),
+                                        text=f"⏱️ {elapsed:.0f}초 | 최고 {best:,}명 / 목표 {soft_target:,}명 | {done:,}회 시도")
+                            st.line_chart(pd.DataFrame(history).set_index('경과(초)'), height=200)
+
+                    # Parallel
+                    g_best_cnt, g_best_idxs = utils.run_simulations(
+                        iters, s_index.to_numpy(), final_scarcity_scores, s_m_keys, s_ex_keys, s_main_map,
+                        s_ex_maps, search_target, n_workers=n_cores, backend=backend, repair=use_repair,
+                        time_limit=time_budget, progress=on_progress, seed=run_seed,
+                        warm_positions=[p for p in s_index.get_indexer(warm_labels) if p >= 0] if warm_labels is not None else None,
+                        group_tiers=group_tiers, enc=enc, cls=cls
+                    )
+                if not cache_hit:
+                    g_best_cnt += n_locked
+                    g_best_idxs = locked_labels + list(g_best_idxs)
+                if use_cache and not cache_hit:
+                    quota_cache.put(c_data, c_key, {'count': g_best_cnt, 'labels': [int(idx) for idx in g_best_idxs], 'seed': run_seed,
+                                                    'exact_info': exact_info, 'pre': pre, 'warm': warm_used})
 
             is_fail = g_best_cnt < soft_target
             
             # -------------------------------------------------------------
             # 엑셀 데이터 및 분석 준비
             # -------------------------------------------------------------
-            fin_idxs = list(g_best_idxs)
-            m_keys_map = {idx: k for idx, k in zip(df_proc.index, m_keys)}
-            ex_keys_maps = [{idx: k for idx, k in zip(df_proc.index, k_list)} for k_list in ex_keys_list]
-            
-            final_m = collections.Counter()
-            final_exs = [collections.Counter() for _ in range(len(ex_configs))]
-            clean_fin_idxs = [int(idx) for idx in fin_idxs]
-            
-            for idx in clean_fin_idxs:
-                final_m[m_keys_map[idx]] += 1
-                for j, cfg in enumerate(ex_configs):
-                    if cfg['cols']:
-                        for k in ex_keys_maps[j][idx]: final_exs[j][k] += 1
+            clean_fin_idxs = [int(idx) for idx in g_best_idxs]
+            st.session_state['quota_last'] = {'sig': setup_sig, 'labels': clean_fin_idxs}
+            final_m, final_exs = quota_report.tally_selection(df_proc.index, clean_fin_idxs, m_keys, ex_keys_list)
+            recs = quota_report.shortage_records(main_map, final_m, m_keys, ex_configs if not use_exact else [{**c, 'tier': 0} for c in ex_configs],
+                                                 final_exs, ex_keys_list, use_main, 0 if use_exact else main_tier) if is_fail else []
+            bottleneck = None
+            if use_explain and is_fail:
+                with st.spinner("병목 진단 중..."):
+                    bottleneck = quota_exact.bottleneck_report(s_m_keys, s_ex_keys, s_main_map, s_ex_maps, None if use_exact else group_tiers,
+                                                               enc=enc, cls=cls)
 
-            recs = []
-            if is_fail:
-                if use_main:
-                    for k, tgt in main_map.items():
-                        act = final_m.get(k, 0); diff = tgt - act
-                        if diff > 0: 
-                            raw_avail = m_cnt.get(k, 0)
-                            reason = "⚠️ 물리적 부족" if raw_avail < tgt else "⚔️ 경합 부족"
-                            recs.append({'순서': 0, '구분': '메인 쿼터', '항목': " / ".join(k), '목표': tgt, '현재': act, '부족': diff, '진단': reason, '전체보유': raw_avail})
-                
-                for j, cfg in enumerate(ex_configs):
-                    if cfg['cols']:
-                        all_vals_raw = []
-                        for keys in ex_keys_list[j]: all_vals_raw.extend(keys)
-                        raw_cnt_map = collections.Counter(all_vals_raw)
-                        for k, tgt in cfg['map'].items():
-                            act = final_exs[j].get(k, 0); diff = tgt - act
-                            if diff > 0: 
-                                raw_avail = raw_cnt_map.get(k, 0)
-                                reason = "⚠️ 물리적 부족" if raw_avail < tgt else "⚔️ 경합 부족"
-                                display_item = " / ".join(k) if isinstance(k, tuple) else k
-                                recs.append({'순서': j+1, '구분': cfg['name'], '항목': display_item, '목표': tgt, '현재': act, '부족': diff, '진단': reason, '전체보유': raw_avail})
-
-            # 엑셀 저장
-            df_survey['Chk'] = "제외"
-            df_survey.loc[clean_fin_idxs, 'Chk'] = "통과"
-            
-            df_all = df_survey.sort_values(by=c_no, ascending=True)
-            df_pass = df_survey[df_survey['Chk'] == "통과"].sort_values(c_no, ascending=True)
-            
-            out = io.BytesIO()
-            with pd.ExcelWriter(out, engine='xlsxwriter') as w:
-                df_all.to_excel(w, index=False, sheet_name='Result_All')
-                df_pass.to_excel(w, index=False, sheet_name='Result_Pass')
-                
-                if recs: 
-                    df_excel = pd.DataFrame(recs)
-                    df_excel['sort_val'] = df_excel['항목'].apply(lambda x: tuple(utils.natural_key(x)))
-                    df_excel = df_excel.sort_values(by=['순서', 'sort_val'], ascending=[True, True])
-                    df_excel.drop(columns=['순서', 'sort_val']).to_excel(w, index=False, sheet_name='Shortage_Analysis')
-                
-                if use_main:
-                        pd.DataFrame([{'G':str(k), 'T':v, 'A':final_m[k]} for k,v in main_map.items()]).to_excel(w, sheet_name='Main_Status')
-
-                for j, cfg in enumerate(ex_configs):
-                    if cfg['cols']:
-                        data_e = []
-                        for k, t in cfg['map'].items():
-                            k_str = " / ".join(k) if isinstance(k, tuple) else k
-                            data_e.append({'Value': k_str, 'Target': t, 'Actual': final_exs[j][k], 'Diff': t - final_exs[j][k]})
-                        pd.DataFrame(data_e).sort_values('Value', key=lambda c: c.map(utils.natural_key)).to_excel(w, sheet_name=cfg['name'], index=False)
+            # 결과 파일은 다운로드 요청 시에만 생성 (아래 '결과 파일' 영역) - 필요한 값만 보관
+            pass_rows = int(df_proc.index.isin(clean_fin_idxs).sum())
+            st.session_state['quota_export'] = {
+                'sig': setup_sig, 'is_fail': is_fail, 'files': {},
+                'args': (clean_fin_idxs, c_no, recs, use_main, main_map, final_m, ex_configs, final_exs),
+                'kwargs': {'run_info': quota_cli.run_info_rows({'seed': run_seed, 'count': g_best_cnt, 'warm': warm_used}, iters, tol, backend, n_cores, time_budget,
+                                                               use_exact, c_int if use_intval else None, int_high_first),
+                           'bottleneck': bottleneck},
+                # 상세 현황 표 (항목 정렬은 여기서 한 번만 - 아래 '쿼터별 상세 현황' 영역이 재실행마다 재사용)
+                'views': quota_report.status_views(use_main, main_map, final_m, algo_main_cols, ex_configs, final_exs),
+            }
             
             # -------------------------------------------------------------
             # 다운로드 버튼 및 검증 메시지
@@ -316,12 +461,8 @@ if data_file:
             st.subheader("📊 할당 결과 시각화")
             
             total_rows = len(df_survey)
-            pass_rows = len(df_pass)
             exclude_rows = total_rows - pass_rows
-            st.info(f"💾 **데이터 저장 완료**: 총 **{total_rows:,}명** (통과 {pass_rows:,}명 + 제외 {exclude_rows:,}명)이 엑셀에 모두 저장되었습니다.")
-
-            btn_label = "📥 결과 파일 다운로드 (Result.xlsx)" if not is_fail else "⚠️ 실패한 결과라도 다운로드"
-            st.download_button(btn_label, out.getvalue(), "result.xlsx", type="primary", use_container_width=True)
+            st.info(f"💾 **결과 준비 완료**: 총 **{total_rows:,}명** (통과 {pass_rows:,}명 + 제외 {exclude_rows:,}명) - 아래 '결과 파일'에서 형식을 골라 파일을 만드세요.")
             
             # 상단 메트릭
             rate = (g_best_cnt / target_total) * 100
@@ -335,68 +476,78 @@ if data_file:
                 st.error("⚠️ 목표 인원을 달성하지 못했습니다. 아래 분석 결과를 확인하세요.")
             else:
                 st.success("🎉 목표 인원을 모두 달성했습니다!")
-            
-            st.markdown("### 🔍 쿼터별 상세 현황")
-            
-            active_ex_cfgs = [(j, cfg) for j, cfg in enumerate(ex_configs) if cfg['cols']]
-            v_tabs = st.tabs(["메인 쿼터"] + [cfg['name'] for _, cfg in active_ex_cfgs])
-            
-            with v_tabs[0]:
-                if use_main:
-                    data_m = []
-                    for k, tgt in main_map.items():
-                        k_str = " / ".join(k)
-                        act = final_m[k]
-                        data_m.append({'Label': k_str, 'Type': '1.목표', 'Value': tgt})
-                        data_m.append({'Label': k_str, 'Type': '2.달성', 'Value': act})
-                    
-                    if data_m:
-                        df_chart_m = pd.DataFrame(data_m)
-                        df_chart_m['sort_val'] = df_chart_m['Label'].apply(lambda x: tuple(utils.natural_key(x)))
-                        df_chart_m = df_chart_m.sort_values('sort_val')
-                        sorted_labels = df_chart_m['Label'].unique().tolist()
-                        
-                        chart_data = df_chart_m.drop(columns=['sort_val'])
-                        chart = alt.Chart(chart_data).mark_bar().encode(
-                            y=alt.Y('Label:N', axis=alt.Axis(title=None), sort=sorted_labels),
-                            x=alt.X('Value:Q', axis=alt.Axis(title='인원수')),
-                            color=alt.Color('Type:N', scale=alt.Scale(domain=['1.목표', '2.달성'], range=['#e0e0e0', '#4c78a8']), legend=alt.Legend(title="구분")),
-                            yOffset='Type:N'
-                        ).properties(height=max(300, len(main_map)*25))
-                        st.altair_chart(chart, use_container_width=True)
-                else:
-                    st.info("메인 쿼터 설정이 없습니다.")
 
-            for idx, (j, cfg) in enumerate(active_ex_cfgs):
-                with v_tabs[idx + 1]:
-                    data_e = []
-                    for k, tgt in cfg['map'].items():
-                        k_str = " / ".join(k) if isinstance(k, tuple) else k
-                        act = final_exs[j][k]
-                        data_e.append({'Label': k_str, 'Type': '1.목표', 'Value': tgt})
-                        data_e.append({'Label': k_str, 'Type': '2.달성', 'Value': act})
-                    
-                    if data_e:
-                        df_chart_e = pd.DataFrame(data_e)
-                        df_chart_e['sort_val'] = df_chart_e['Label'].apply(lambda x: tuple(utils.natural_key(x)))
-                        df_chart_e = df_chart_e.sort_values('sort_val')
-                        sorted_labels_e = df_chart_e['Label'].unique().tolist()
-                        
-                        chart_data_e = df_chart_e.drop(columns=['sort_val'])
-                        chart = alt.Chart(chart_data_e).mark_bar().encode(
-                            y=alt.Y('Label:N', axis=alt.Axis(title=None), sort=sorted_labels_e),
-                            x=alt.X('Value:Q', axis=alt.Axis(title='인원수')),
-                            color=alt.Color('Type:N', scale=alt.Scale(domain=['1.목표', '2.달성'], range=['#e0e0e0', '#4c78a8']), legend=alt.Legend(title="구분")),
-                            yOffset='Type:N'
-                        ).properties(height=max(300, len(cfg['map'])*25))
-                        st.altair_chart(chart, use_container_width=True)
+            if not use_exact and warm_used:
+                st.caption(f"🎲 난수 시드: {run_seed} (직전 결과에서 이어서 계산 - 시드만으로는 재현되지 않습니다. 재현하려면 시드를 지정해 다시 실행하세요)")
+            elif not use_exact and quota_engine.reproducible_run(run_seed, time_budget):
+                st.caption(f"🎲 난수 시드: {run_seed} (같은 시드로 다시 실행하면 보정 단계까지 같은 결과를 재현합니다)")
+            elif not use_exact:
+                st.caption(f"🎲 난수 시드: {run_seed} (시간 제한 실행은 같은 시드라도 결과가 달라질 수 있습니다)")
+            if exact_info:
+                method = "최대유량" if exact_info['method'] == 'flow' else "LP 완화 분기한정"
+                if exact_info['optimal']:
+                    st.caption(f"🧮 정확해 ({method}): {g_best_cnt:,}명이 가능한 최대 매칭 수입니다.")
+                elif exact_info.get('dup_keys'):
+                    st.caption(f"🧮 정확해 ({method}): 복수응답에 같은 키가 겹치는 응답자가 있어 목표를 넘기지 않는 기준으로 {g_best_cnt:,}명을 찾았습니다. "
+                               f"그리디는 이런 응답자를 잔여 1명만 있어도 받으므로 더 많을 수 있습니다 (그리디 기준 상한 {exact_info['bound']:,}명).")
+                else:
+                    st.caption(f"🧮 정확해 ({method}): 시간 제한 도달 - 현재 {g_best_cnt:,}명, 이론 상한 {exact_info['bound']:,}명")
             
             if recs:
                 st.divider()
                 st.subheader("📉 부족 쿼터 분석 및 진단")
-                df_recs = pd.DataFrame(recs)
-                df_recs['sort_val'] = df_recs['항목'].apply(lambda x: tuple(utils.natural_key(x)))
-                df_recs = df_recs.sort_values(by=['순서', 'sort_val'], ascending=[True, True])
-                st.dataframe(df_recs.drop(columns=['순서', 'sort_val']), use_container_width=True, hide_index=True)
+                st.dataframe(quota_report.shortage_frame(recs), use_container_width=True, hide_index=True)
+
+            if bottleneck:
+                rivals, recruit, prices = quota_report.bottleneck_frames(bottleneck, ['메인 쿼터'] + [cfg['name'] for cfg in ex_configs])
+                st.subheader("🧭 병목 진단")
+                st.caption(f"LP 완화 상한 {bottleneck['lp_bound']:,.0f}명 기준. 쌍대가격 = 해당 셀 목표를 1 늘릴 때 늘어나는 달성 수")
+                b1, b2, b3 = st.tabs(["경합 셀", "추가 모집 효과", "묶인 셀"])
+                with b1:
+                    st.dataframe(rivals, use_container_width=True, hide_index=True)
+                with b2:
+                    st.dataframe(recruit, use_container_width=True, hide_index=True)
+                with b3:
+                    st.dataframe(prices, use_container_width=True, hide_index=True)
 
         except Exception as e: st.error("오류 발생"); st.code(traceback.format_exc())
+
+    export = st.session_state.get('quota_export')
+
+    # ==========================================================================
+    # 쿼터별 상세 현황 (셀이 많으면 히트맵 / 부족 상위 목록으로 집계)
+    # ==========================================================================
+    if export is not None and export['sig'] == setup_sig:
+        st.divider()
+        st.markdown("### 🔍 쿼터별 상세 현황")
+        views = export['views']
+        v_tabs = st.tabs([name for name, _, _ in views])
+        for idx, (name, status, dims) in enumerate(views):
+            with v_tabs[idx]:
+                if status is None:
+                    st.info("메인 쿼터 설정이 없습니다.")
+                else:
+                    quota_view(f"view_{idx}", status, dims)
+
+    # ==========================================================================
+    # 결과 파일 (요청 시 생성 - 매칭 직후에는 만들지 않음)
+    # ==========================================================================
+    if export is not None and export['sig'] == setup_sig:
+        st.divider()
+        st.subheader("💾 결과 파일")
+        formats = {"엑셀 (xlsx)": ('xlsx', "result.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+                   "CSV 묶음 (zip, 빠름)": ('csv', "result_csv.zip", "application/zip")}
+        if quota_report.PARQUET_AVAILABLE:
+            formats["Parquet 묶음 (zip, 빠름)"] = ('parquet', "result_parquet.zip", "application/zip")
+        fmt, fname, mime = formats[st.radio("파일 형식", list(formats), horizontal=True, key="export_fmt")]
+        if fmt not in export['files'] and st.button("📦 결과 파일 만들기"):
+            with st.spinner("결과 파일 생성 중..."):
+                buf = io.BytesIO()
+                if fmt == 'xlsx':
+                    quota_report.write_result_workbook(buf, df_survey, *export['args'], **export['kwargs'])
+                else:
+                    quota_report.write_result_archive(buf, df_survey, *export['args'], **export['kwargs'], fmt=fmt)
+                export['files'][fmt] = buf.getvalue()
+        if fmt in export['files']:
+            btn_label = f"📥 결과 파일 다운로드 ({fname})" if not export['is_fail'] else f"⚠️ 실패한 결과라도 다운로드 ({fname})"
+            st.download_button(btn_label, export['files'][fmt], fname, mime=mime, type="primary", use_container_width=True)
@@ -0,0 +1,203 @@
+"""
+쿼터 솔버 벤치마크 (Streamlit 비의존 모듈)
+
+엔진 변경이 할당 속도/품질에 주는 영향을 재기 위한 합성 데이터 생성기 + 실행기입니다.
+- 합성 설문: 응답자 수, 메인 차원 수, 추가 그룹 수, 복수응답 열 수, 목표 빡빡함(tightness) 조절
+- 솔버 모드: 그리디 / 그리디+보정 / 정확해 x 스레드 / 프로세스
+- 측정: 실행 시간, 초당 시도 수, 메모리 최대치, 이론 상한 대비 달성률
+
+명령행:
+    python quota_bench.py --sizes 1000 50000 --groups 3 --multi 2 --tightness 0.6 --iters 500 2000 -o bench.csv
+    python quota_bench.py --sizes 5000 --modes repaired repaired-proc --check-repro   (같은 시드 재실행 일치 점검)
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+import quota_cli
+import quota_engine
+
+# 모드 이름 -> solve_quota 옵션
+MODES = {
+    'greedy':          {'repair': False, 'backend': 'threads'},
+    'repaired':        {'repair': True,  'backend': 'threads'},
+    'greedy-proc':     {'repair': False, 'backend': 'processes'},
+    'repaired-proc':   {'repair': True,  'backend': 'processes'},
+    'exact':           {'exact': True},
+}
+
+# 메모리 측정 실행의 시도 횟수 상한 (탐색 메모리는 시도 횟수와 무관하고 tracemalloc 은 느리므로)
+MEMORY_ITERS = 50
+
+
+# ==============================================================================
+# 1. 합성 설문 생성
+# ==============================================================================
+def _skewed(rng, n, levels):
+    """치우친 분포(디리클레 비율)의 1..levels 정수 값"""
+    return rng.choice(np.arange(1, levels + 1), n, p=rng.dirichlet(np.full(levels, 2.0)))
+
+def _blend_targets(counts, total, tightness):
+    """목표 = tightness x (실제 분포 절반 + 균등 분포 절반). 드문 셀은 물리적 부족, 흔한 셀은 경합이 생김"""
+    counts = pd.Series(counts, dtype=float)
+    share = 0.5 * counts / max(counts.sum(), 1) + 0.5 / len(counts)
+    return {k: int(round(v)) for k, v in (share * total * tightness).items() if round(v) > 0}
+
+def synthetic_survey(n=1000, n_main=3, main_levels=3, n_groups=2, multi=1, levels=4, tightness=0.6, seed=0):
+    """
+    합성 응답자 표와 쿼터 설정
+    n_main: 메인 쿼터 차원 수 (각 main_levels 개 값), n_groups: 추가 그룹 수 (각 levels 개 값)
+    multi: 추가 그룹별 복수응답 열 수 (2 이상이면 'Q1_1+Q1_2' 처럼 여러 열을 함께 집계, 빈 응답 포함)
+    tightness: 전체 목표 / 응답자 수 (0 ~ 1)
+    반환 dict: df, main_cols, main_map, ex_configs
+    """
+    rng = np.random.default_rng(seed)
+    data = {'ID': np.arange(1, n + 1)}
+    main_cols = [f'M{d + 1}' for d in range(n_main)]
+    for c in main_cols:
+        data[c] = _skewed(rng, n, main_levels)
+    df = pd.DataFrame(data)
+
+    total = n * tightness
+    cell_counts = df.groupby(main_cols).size()
+    main_map = {tuple(str(v) for v in (k if isinstance(k, tuple) else (k,))): t
+                for k, t in _blend_targets(cell_counts, total, 1.0).items()}
+
+    ex_configs = []
+    for g in range(n_groups):
+        cols = [f'Q{g + 1}_{j + 1}' for j in range(multi)]
+        for j, c in enumerate(cols):
+            vals = _skewed(rng, n, levels).astype(float)
+            if j > 0:
+                vals[rng.random(n) < 0.5] = np.nan   # 두 번째 응답부터는 절반만 응답
+            df[c] = vals
+        counts = pd.concat([df[c] for c in cols]).dropna().astype(int).astype(str).value_counts()
+        mentions = counts.sum() / n
+        ex_configs.append({'cols': cols, 'map': _blend_targets(counts, total * mentions, 1.0),
+                           'name': f'Q{g + 1}', 'mode': 'simple'})
+    return {'df': df, 'main_cols': main_cols, 'main_map': main_map, 'ex_configs': ex_configs}
+
+
+# ==============================================================================
+# 2. 실행 / 측정
+# ==============================================================================
+def run_case(case, mode, iters=2000, n_workers=None, seed=1, exact_limit=60.0, memory=True):
+    """
+    합성 설문 1개를 모드 1개로 실행하고 측정값 dict 를 반환합니다.
+    메모리는 같은 설정(시도 횟수 상한 MEMORY_ITERS)의 별도 실행에서 tracemalloc 최대치로 잽니다.
+    프로세스 모드의 워커 메모리는 포함되지 않습니다 (호출 프로세스 기준).
+    """
+    opts = MODES[mode]
+    done = {'iters': 0}
+    def progress(elapsed, best, n_done):
+        done['iters'] = n_done
+
+    def solve(n_iters, track):
+        return quota_cli.solve_quota(
+            case['df'], case['main_cols'], case['main_map'], case['ex_configs'], iters=n_iters,
+            n_workers=n_workers, seed=seed, exact_limit=exact_limit, progress=track, **opts)
+
+    t0 = time.perf_counter()
+    res = solve(iters, None if opts.get('exact') else progress)
+    wall = time.perf_counter() - t0
+
+    peak_mb = np.nan
+    if memory:
+        tracemalloc.start()
+        try:
+            solve(min(iters, MEMORY_ITERS), None)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+
+    n_iters = done['iters'] if not opts.get('exact') else np.nan
+    return {
+        '모드': mode, '응답자 수': len(case['df']), '추가 그룹 수': len(case['ex_configs']),
+        '시도 횟수': iters if not opts.get('exact') else np.nan, '실행 시도 수': n_iters,
+        '실행 시간(초)': round(wall, 3), '초당 시도 수': round(n_iters / wall, 1) if wall > 0 else np.nan,
+        '메모리 최대(MB)': round(peak_mb, 1), '목표': res['target_total'], '이론 상한': res['bound'],
+        '매칭 수': res['count'], '상한 대비(%)': round(res['count'] / max(res['bound'], 1) * 100, 2),
+        '목표 대비(%)': round(res['count'] / max(res['target_total'], 1) * 100, 2),
+    }
+
+def run_benchmark(sizes=(1000,), modes=('greedy', 'repaired'), iters_list=(2000,), n_groups=2, multi=1,
+                  tightness=0.6, n_workers=None, seed=1, exact_limit=60.0, memory=True, log=print):
+    """
+    응답자 수 x 모드 x 시도 횟수 조합을 실행해 결과 표를 반환합니다.
+    시도 횟수를 여러 개 주면 같은 데이터에서 시간 대비 품질 곡선을 그릴 수 있습니다 (정확해는 1번만 실행).
+    """
+    rows = []
+    for n in sizes:
+        case = synthetic_survey(n, n_groups=n_groups, multi=multi, tightness=tightness, seed=seed)
+        for mode in modes:
+            for iters in (iters_list if not MODES[mode].get('exact') else iters_list[:1]):
+                row = run_case(case, mode, iters, n_workers, seed, exact_limit, memory)
+                rows.append(row)
+                if log:
+                    log(f"[{mode}] N={n:,} iters={iters:,}: {row['실행 시간(초)']}s, "
+                        f"{row['매칭 수']:,}/{row['이론 상한']:,} ({row['상한 대비(%)']}%)")
+    return pd.DataFrame(rows)
+
+def check_reproducible(case, mode='repaired', iters=2000, n_workers=None, seed=1, runs=2, group_tiers=None):
+    """
+    같은 시드로 runs 번 다시 실행해 선택 ID 가 모두 같은지 확인합니다 (보정 단계 포함 재현성 회귀 점검)
+    group_tiers 를 주면 하드 / 소프트 등급 실행(등급 보정 포함)을 점검합니다.
+    """
+    picks = [sorted(quota_cli.solve_quota(
+        case['df'], case['main_cols'], case['main_map'], case['ex_configs'], iters=iters,
+        n_workers=n_workers, seed=seed, group_tiers=group_tiers, **MODES[mode])['labels']) for _ in range(runs)]
+    return all(p == picks[0] for p in picks[1:])
+
+
+# ==============================================================================
+# 3. 명령행 진입점
+# ==============================================================================
+def build_parser():
+    p = argparse.ArgumentParser(prog="quota-bench", description="쿼터 솔버 벤치마크 (합성 데이터)")
+    p.add_argument("--sizes", nargs="+", type=int, default=[1000], help="응답자 수 목록 (기본: 1000)")
+    p.add_argument("--modes", nargs="+", choices=list(MODES), default=['greedy', 'repaired'], help="솔버 모드 목록")
+    p.add_argument("--iters", nargs="+", type=int, default=[2000], help="시도 횟수 목록 (기본: 2000)")
+    p.add_argument("--groups", type=int, default=2, help="추가 그룹 수 (기본: 2)")
+    p.add_argument("--multi", type=int, default=1, help="추가 그룹별 복수응답 열 수 (기본: 1)")
+    p.add_argument("--tightness", type=float, default=0.6, help="전체 목표 / 응답자 수 (기본: 0.6)")
+    p.add_argument("--workers", type=int, help=f"워커 수 (기본: CPU 코어 수 {quota_engine.cpu_count()})")
+    p.add_argument("--seed", type=int, default=1, help="데이터/탐색 난수 시드 (기본: 1)")
+    p.add_argument("--exact-limit", type=float, default=60.0, help="정확해 시간 제한(초) (기본: 60)")
+    p.add_argument("--no-memory", action="store_true", help="메모리 측정 실행 생략")
+    p.add_argument("--check-repro", action="store_true", help="측정 대신 같은 시드 재실행의 선택 ID 일치 여부만 점검")
+    p.add_argument("-o", "--out", help="결과 저장 경로 (csv / xlsx)")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.check_repro:
+        failed = 0
+        for n in args.sizes:
+            case = synthetic_survey(n, n_groups=args.groups, multi=args.multi, tightness=args.tightness, seed=args.seed)
+            # 마지막 추가 그룹을 소프트로 둔 등급 실행도 함께 점검
+            tier_sets = [None] + ([[0] * args.groups + [1]] if args.groups else [])
+            for mode in [m for m in args.modes if not MODES[m].get('exact')]:
+                for tiers in tier_sets:
+                    ok = check_reproducible(case, mode, args.iters[0], args.workers, args.seed, group_tiers=tiers)
+                    failed += not ok
+                    print(f"[{mode}{' / 소프트' if tiers else ''}] N={n:,} iters={args.iters[0]:,}: "
+                          f"{'재현 OK' if ok else '재현 실패 (같은 시드에서 선택 ID 가 다름)'}")
+        return 1 if failed else 0
+    df = run_benchmark(args.sizes, args.modes, args.iters, args.groups, args.multi, args.tightness,
+                       args.workers, args.seed, args.exact_limit, not args.no_memory)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(df.to_string(index=False))
+    if args.out:
+        if args.out.lower().endswith('.xlsx'):
+            df.to_excel(args.out, index=False, sheet_name='Benchmark')
+        else:
+            df.to_csv(args.out, index=False, encoding='utf-8-sig')
+        print(f"결과 저장: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+쿼터 솔버 결과 디스크 캐시 (Streamlit 비의존 모듈)
+
+새로고침/세션 만료 후 같은 설문과 쿼터 파일을 다시 올리면 저장된 결과를 바로 돌려줍니다.
+- 데이터 키: 응답자 라벨 + 정규화된 메인/추가 쿼터 키 (목표와 무관)
+- 결과 키: 데이터 키 + 정렬 점수 + 정규화된 목표 + 실행 옵션(시도 횟수, 시드 등)
+같은 데이터 키의 최근 결과는 목표가 바뀐 재계산의 웜 스타트에 쓸 수 있습니다.
+파일 이름이 '<데이터 키>_<결과 키>.pkl' 이고, 전체 크기가 한도를 넘으면 가장 오래 쓰지 않은 파일부터 지웁니다.
+pickle 은 읽을 때 코드를 실행할 수 있으므로 현재 사용자 전용 폴더(0700)의 현재 사용자 파일만 읽고 씁니다.
+"""
+import os
+import glob
+import stat
+import pickle
+import getpass
+import hashlib
+import tempfile
+import numpy as np
+
+DEFAULT_DIR = os.environ.get("QUOTA_CACHE_DIR", os.path.join(tempfile.gettempdir(), f"quota_cache_{getpass.getuser()}"))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+# ==============================================================================
+# 1. 키 계산
+# ==============================================================================
+def _digest(*parts):
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else pickle.dumps(p, protocol=4))
+    return h.hexdigest()[:32]
+
+def _norm_map(q_map):
+    """목표 dict -> 순서 무관 비교용 정렬 튜플 (numpy 정수/실수 목표도 같은 값이면 같은 키)"""
+    return tuple(sorted((repr(k), float(v)) for k, v in q_map.items()))
+
+def data_key(indices, m_keys, ex_keys_list):
+    """응답자 라벨 + 쿼터 키 해시 (목표와 무관)"""
+    return _digest([str(i) for i in indices], m_keys, ex_keys_list)
+
+def result_key(d_key, scores, main_map, ex_maps_list, params):
+    """데이터 키 + 정렬 점수 + 목표 + 실행 옵션 해시"""
+    return _digest(d_key, np.ascontiguousarray(scores, dtype=np.float64).tobytes(),
+                   _norm_map(main_map), [_norm_map(m) for m in ex_maps_list], sorted(params.items()))
+
+def solver_params(exact, iters, time_limit, exact_limit, tol, repair, seed, n_workers, group_tiers=None, warm=False):
+    """
+    결과에 영향을 주는 실행 옵션 (화면/헤드리스 공통). seed 가 None 이면 자동 시드 실행끼리 같은 키
+    결과가 옵션만의 함수인 것은 정확해와 quota_engine.reproducible_run 실행뿐이므로 호출부는 그때만 그대로 재사용합니다.
+    warm: 이전 결과에서 이어서 계산한 실행 (처음부터 계산한 결과와 다른 키)
+    """
+    if exact:
+        return {'solver': 'exact', 'exact_limit': exact_limit, 'tol': tol}
+    params = {'solver': 'greedy', 'iters': iters, 'time_limit': time_limit, 'tol': tol, 'repair': bool(repair),
+              'seed': seed, 'n_workers': n_workers}
+    if group_tiers is not None and any(group_tiers):
+        params['tiers'] = tuple(int(t) for t in group_tiers)
+    if warm:
+        params['warm'] = True
+    return params
+
+
+# ==============================================================================
+# 2. 읽기 / 쓰기 / LRU 정리
+# ==============================================================================
+def _owned(st):
+    """현재 사용자 소유 여부 (소유자 개념이 없는 플랫폼은 True)"""
+    return not hasattr(os, 'getuid') or st.st_uid == os.getuid()
+
+def _private_dir(cache_dir, create=False):
+    """
+    캐시 폴더가 현재 사용자 전용인지 확인합니다 (심볼릭 링크 아님, 소유자 = 현재 사용자, 그룹/기타 쓰기 권한 없음).
+    create=True 이면 없을 때 0700 으로 만듭니다. 다른 사용자가 쓸 수 있는 폴더면 False (캐시 미사용)
+    """
+    if create:
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        except OSError:
+            return False
+    try:
+        st = os.lstat(cache_dir)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and _owned(st) and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+def _path(cache_dir, d_key, r_key):
+    return os.path.join(cache_dir, f"{d_key}_{r_key}.pkl")
+
+def _load(path):
+    try:
+        with open(path, 'rb') as f:
+            if not _owned(os.fstat(f.fileno())):
+                return None
+            entry = pickle.load(f)
+        os.utime(path)   # 최근 사용 시각 갱신 (LRU)
+        return entry
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def get(d_key, r_key, cache_dir=None):
+    """완전 적중: 같은 데이터 / 목표 / 옵션의 저장 결과 (없으면 None)"""
+    cache_dir = cache_dir or DEFAULT_DIR
+    if not _private_dir(cache_dir):
+        return None
+    return _load(_path(cache_dir, d_key, r_key))
+
+def get_latest(d_key, cache_dir=None):
+    """부분 적중: 같은 데이터의 가장 최근 결과 (목표/옵션이 달라도 웜 스타트용으로 사용)"""
+    cache_dir = cache_dir or DEFAULT_DIR
+    if not _private_dir(cache_dir):
+        return None
+    paths = glob.glob(os.path.join(cache_dir, f"{d_key}_*.pkl"))
+    for path in sorted(paths, key=os.path.getmtime, reverse=True):
+        entry = _load(path)
+        if entry is not None:
+            return entry
+    return None
+
+def put(d_key, r_key, entry, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+    """결과 저장 (임시 파일에 쓴 뒤 교체) 후 크기 한도에 맞춰 정리. 전용 폴더를 쓸 수 없으면 저장하지 않음"""
+    cache_dir = cache_dir or DEFAULT_DIR
+    if not _private_dir(cache_dir, create=True):
+        return
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(entry, f, protocol=4)
+    os.replace(tmp, _path(cache_dir, d_key, r_key))
+    evict(cache_dir, max_bytes)
+
+def evict(cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+    """전체 크기가 max_bytes 이하가 될 때까지 가장 오래 쓰지 않은 파일부터 삭제. 반환: 삭제한 파일 수"""
+    cache_dir = cache_dir or DEFAULT_DIR
+    if not _private_dir(cache_dir):
+        return 0
+    files = []
+    for path in glob.glob(os.path.join(cache_dir, "*.pkl")):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size; removed += 1
+    return removed
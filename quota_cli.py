@@ -0,0 +1,486 @@
+"""
+쿼터 자동 할당 헤드리스 실행 (Streamlit 비의존 모듈)
+
+명령행:
+    python quota_cli.py 설문.csv 쿼터.xlsx --main-cols 성별 연령 지역 --id-col ID -o result.xlsx
+    python quota_cli.py 설문.csv 쿼터.xlsx --scenario 쿼터_B.xlsx --tols 0 5 10 -o compare.xlsx   (시나리오 비교)
+
+Python:
+    import quota_cli
+    res = quota_cli.run_quota_file("설문.csv", "쿼터.xlsx", "result.xlsx", main_cols=["성별", "연령", "지역"], id_col="ID")
+
+쿼터 파일 형식
+- 첫 번째 시트: 메인 쿼터 (화면의 '엑셀 업로드'와 같은 키 열 N개 + target 열, 머리글 없음)
+  - N = --main-cols 변수 수 (생략 시 3). 병합 셀로 비어 있는 키 칸은 위 값으로 채움
+- 나머지 시트: 추가 쿼터 그룹 1개씩 (시트 이름 = 그룹 이름, 첫 행 = 머리글, 마지막 열 = 목표)
+  - 키 열이 1개: 단순형. 머리글에 변수명을 '+' 로 이어 쓰면 여러 변수의 값을 함께 집계 (예: Q5_1+Q5_2)
+  - 키 열이 2개 이상: 조합형. 각 머리글이 변수명
+"""
+import io
+import os
+import re
+import sys
+import collections
+import argparse
+import chardet
+import numpy as np
+import pandas as pd
+
+import quota_cache
+import quota_engine
+import quota_exact
+import quota_report
+import quota_scoring
+
+
+# ==============================================================================
+# 1. 입력 로딩
+# ==============================================================================
+def read_table(path):
+    """설문 데이터 읽기 (CSV 인코딩 자동 감지 / XLSX / XLS)"""
+    name = str(path).lower()
+    if name.endswith('.csv'):
+        with open(path, 'rb') as f:
+            raw_data = f.read()
+        result = chardet.detect(raw_data)
+        encoding = result['encoding'] if result['encoding'] else 'utf-8'
+        if encoding and 'EUC-KR' in encoding.upper(): encoding = 'cp949'
+        return pd.read_csv(io.BytesIO(raw_data), encoding=encoding)
+    if name.endswith('.xlsx'):
+        return pd.read_excel(path, engine='openpyxl')
+    if name.endswith('.xls'):
+        return pd.read_excel(path, engine='xlrd')
+    raise ValueError(f"지원하지 않는 파일 형식입니다: {path}")
+
+def quota_key_cols(n_dims=3):
+    """메인 쿼터 키 열 이름 ['qt1', ..., 'qtN']"""
+    return [f'qt{d + 1}' for d in range(n_dims)]
+
+def transform_pivoted_quota(df_raw, n_dims=3):
+    """메인 쿼터 시트 -> qt1..qtN / target DataFrame (키 열의 빈 칸은 위 값으로 채움). 열이 모자라면 빈 DataFrame"""
+    if len(df_raw.columns) < n_dims + 1:
+        return pd.DataFrame()
+    keys = quota_key_cols(n_dims)
+    df = df_raw.iloc[:, :n_dims + 1].copy()
+    df.columns = keys + ['target']
+    df[keys] = df[keys].ffill(axis=0)
+    return df
+
+def main_map_from_sheet(raw, n_dims=3):
+    """메인 쿼터 시트(머리글 없음) -> {(qt1, ..., qtN): 목표}"""
+    flat = transform_pivoted_quota(raw, n_dims)
+    return {
+        tuple(quota_scoring.normalize_value(v) for v in r[:-1]): r[-1]
+        for r in flat.itertuples(index=False)
+    }
+
+def extra_config_from_sheet(name, sheet):
+    """추가 쿼터 시트 -> 화면과 같은 ex_config {'cols', 'map', 'name', 'mode'}"""
+    key_cols = list(sheet.columns[:-1])
+    config = {'cols': [], 'map': {}, 'name': quota_report.sanitize_sheet_name(str(name)), 'mode': 'simple'}
+    if not key_cols:
+        return config
+    if len(key_cols) == 1:
+        config['cols'] = [c.strip() for c in str(key_cols[0]).split('+')]
+    else:
+        config['mode'] = 'grid'
+        config['cols'] = [str(c).strip() for c in key_cols]
+
+    for r in sheet.itertuples(index=False):
+        try:
+            t = int(r[-1])
+        except (TypeError, ValueError):
+            continue
+        if t > 0:
+            keys = tuple(quota_scoring.normalize_value(v) for v in r[:-1])
+            config['map'][keys[0] if config['mode'] == 'simple' else keys] = t
+    return config
+
+def load_quota_spec(path, n_dims=3):
+    """쿼터 파일 -> (main_map, ex_configs). n_dims: 메인 쿼터 키 열 수"""
+    sheets = pd.read_excel(path, sheet_name=None, header=None)
+    names = list(sheets)
+    main_map = main_map_from_sheet(sheets[names[0]], n_dims)
+    ex_configs = []
+    for name in names[1:]:
+        raw = sheets[name].dropna(how='all')
+        if raw.empty: continue
+        sheet = raw.iloc[1:].reset_index(drop=True)
+        sheet.columns = [str(c) for c in raw.iloc[0]]
+        ex_configs.append(extra_config_from_sheet(name, sheet))
+    return main_map, ex_configs
+
+
+# ==============================================================================
+# 2. 할당 실행 (Python API)
+# ==============================================================================
+def read_id_list(arg):
+    """ID 목록 인자: 파일 경로(csv/xlsx/txt - 첫 번째 컬럼) 또는 쉼표/공백 구분 문자열"""
+    if arg is None:
+        return []
+    if os.path.isfile(arg):
+        if arg.lower().endswith('.txt'):
+            with open(arg, encoding='utf-8') as f:
+                return parse_id_text(f.read())
+        return read_table(arg).iloc[:, 0].dropna().tolist()
+    return parse_id_text(arg)
+
+def parse_id_text(text):
+    """'1001, 1002\n1003' -> ['1001', '1002', '1003']"""
+    return [t for t in re.split(r'[\s,;]+', str(text)) if t]
+
+def id_positions(df, id_col, ids):
+    """ID 목록 -> 데이터 위치 리스트 (1, 1.0, "1" 통일). 반환: (위치 리스트, 데이터에 없는 ID 리스트)"""
+    if not ids:
+        return [], []
+    pos_of = collections.defaultdict(list)
+    for p, v in enumerate(quota_scoring.normalize_column(df[id_col]).tolist()):
+        pos_of[v].append(p)
+    positions, missing = [], []
+    for v in dict.fromkeys(quota_scoring.normalize_value(i) for i in ids):
+        if v in pos_of: positions.extend(pos_of[v])
+        else: missing.append(v)
+    return positions, missing
+
+def solve_quota(df, main_cols, main_map, ex_configs, iters=10000, tol=0, use_main=True, backend="threads", n_workers=None,
+                seed=None, repair=True, time_limit=None, exact=False, exact_limit=60.0, progress=None,
+                priority_col=None, priority_high_first=True, use_cache=False, cache_dir=None, reuse_auto=False, group_tiers=None,
+                id_col=None, include_ids=None, exclude_ids=None, explain=False):
+    """
+    화면의 '매칭 시작'과 같은 계산 (키 추출 -> 희소성 -> 사전 진단 -> 탐색/정확해 -> 부족 진단)
+    priority_col: intval 보조 우선순위 컬럼 (희소성이 같은 응답자 중 우선 선택)
+    use_cache: 디스크 결과 캐시 사용 (시드 지정/정확해 실행은 완전 적중 시 탐색 생략, 시드 미지정 실행은 같은 데이터의 최근 결과로 웜 스타트)
+    reuse_auto: 시드 미지정 실행도 완전 적중 결과 사용 (이때는 웜 스타트 없이 계산)
+    group_tiers: 그룹별 등급 [메인, 추가 1, ...] (0 = 하드, 1 이상 = 소프트 우선순위). 정확해 모드에서는 모두 하드로 계산
+    include_ids / exclude_ids: id_col 기준 고정 포함 / 제외 ID (포함 인원은 목표에서 미리 빼고 탐색 대상에서 제외)
+    explain: 목표 미달 시 LP 쌍대가격 병목 진단 (quota_exact.bottleneck_report) 추가
+    반환 dict: count, labels, target_total, soft_target, is_fail, bound, short_cells,
+              final_m, final_exs, recs, seed, warm, exact_info, m_keys, ex_keys_list, locked, lock_over, unknown_ids, bottleneck
+    """
+    m_keys = quota_scoring.extract_main_keys(df, main_cols if use_main else [])
+    ex_keys_list = [quota_scoring.extract_extra_keys(df, cfg) for cfg in ex_configs]
+    ex_maps = [cfg['map'] for cfg in ex_configs]
+
+    target_total = sum(main_map.values())
+    soft_target = target_total - tol
+
+    # 고정 포함 / 제외: 탐색은 남은 응답자와 남은 목표로만 수행
+    include_pos, miss_in = id_positions(df, id_col, include_ids)
+    exclude_pos, miss_ex = id_positions(df, id_col, exclude_ids)
+    locks = None
+    s_index, s_m_keys, s_ex_keys, s_main_map, s_ex_maps = df.index, m_keys, ex_keys_list, main_map, ex_maps
+    locked_labels = []
+    if include_pos or exclude_pos:
+        locks = quota_engine.apply_locks(m_keys, ex_keys_list, main_map, ex_maps, include_pos, exclude_pos)
+        s_index = df.index[locks['keep']]
+        s_m_keys, s_ex_keys = locks['m_keys'], locks['ex_keys_list']
+        s_main_map, s_ex_maps = locks['main_map'], locks['ex_maps_list']
+        locked_labels = [int(idx) for idx in df.index[locks['locked']]]
+    n_locked = len(locked_labels)
+
+    scores = quota_scoring.scarcity_scores(s_m_keys, s_ex_keys, s_main_map, s_ex_maps, use_main=use_main)
+    if priority_col is not None:
+        prio = df[priority_col] if locks is None else df[priority_col].to_numpy()[locks['keep']]
+        scores = quota_scoring.with_priority(scores, prio, priority_high_first)
+
+    # 웜 스타트: 시드 미지정 실행만 같은 데이터의 최근 캐시 결과에서 이어서 계산 (시드 지정 실행은 재현성 유지)
+    c_data = quota_cache.data_key(s_index, s_m_keys, s_ex_keys) if use_cache else None
+    prev = quota_cache.get_latest(c_data, cache_dir) if use_cache and not exact and not seed and not reuse_auto and not any(group_tiers or []) else None
+
+    hit = None
+    if use_cache:
+        c_params = quota_cache.solver_params(
+            exact, iters, time_limit, exact_limit, tol, repair, int(seed) if seed else None, n_workers or quota_engine.cpu_count(), group_tiers,
+            warm=prev is not None)
+        c_key = quota_cache.result_key(c_data, scores, s_main_map, s_ex_maps, {**c_params, 'locked': tuple(locked_labels)})
+        # 시간 제한 실행은 같은 시드라도 결과가 달라지므로 reuse_auto 일 때만 재사용
+        if exact or quota_engine.reproducible_run(c_params['seed'], time_limit) or reuse_auto:
+            hit = quota_cache.get(c_data, c_key, cache_dir)
+
+    enc = cls = None
+    if hit is not None:
+        pre = hit['pre']
+        cnt, labels, exact_info, run_seed, warm = hit['count'], hit['labels'], hit['exact_info'], hit['seed'], hit.get('warm', False)
+    else:
+        # 키 인코딩 / 클래스 압축은 한 번만 (사전 진단 / 솔버 / 병목 진단 공유)
+        enc = quota_engine.encode_quota(s_m_keys, s_ex_keys, s_main_map, s_ex_maps)
+        cls = quota_engine.compress_classes(enc['indptr'], enc['cells'], scores)
+        pre = quota_exact.precheck(scores, s_m_keys, s_ex_keys, s_main_map, s_ex_maps, None if exact else group_tiers, enc=enc, cls=cls)
+        pre = {**pre, 'bound': pre['bound'] + n_locked}
+        search_target = max(0, min(soft_target, pre['bound']) - n_locked)
+
+        exact_info = None
+        run_seed = int(seed) if seed else int(np.random.SeedSequence().entropy % (2**31 - 1)) + 1
+        warm = prev is not None
+        if exact:
+            cnt, labels, exact_info = quota_exact.solve_exact(
+                s_index.to_numpy(), scores, s_m_keys, s_ex_keys, s_main_map, s_ex_maps, time_limit=exact_limit, enc=enc, cls=cls
+            )
+        else:
+            cnt, labels = quota_engine.run_simulations(
+                iters, s_index.to_numpy(), scores, s_m_keys, s_ex_keys, s_main_map, s_ex_maps, search_target,
+                n_workers=n_workers, backend=backend, repair=repair, time_limit=time_limit, progress=progress, seed=run_seed,
+                warm_positions=[p for p in s_index.get_indexer(prev['labels']) if p >= 0] if prev else None,
+                group_tiers=group_tiers, enc=enc, cls=cls
+            )
+        cnt += n_locked
+        labels = locked_labels + [int(idx) for idx in labels]
+        if exact_info:
+            exact_info = {**exact_info, 'bound': exact_info['bound'] + n_locked}
+        if use_cache:
+            quota_cache.put(c_data, c_key, {'count': cnt, 'labels': labels, 'seed': run_seed,
+                                            'exact_info': exact_info, 'pre': pre, 'warm': warm}, cache_dir)
+
+    labels = [int(idx) for idx in labels]
+    is_fail = cnt < soft_target
+    final_m, final_exs = quota_report.tally_selection(df.index, labels, m_keys, ex_keys_list)
+    tiers = group_tiers if group_tiers is not None and not exact else [0] * (len(ex_configs) + 1)
+    tier_cfgs = [{**cfg, 'tier': t} for cfg, t in zip(ex_configs, tiers[1:])]
+    recs = quota_report.shortage_records(main_map, final_m, m_keys, tier_cfgs, final_exs, ex_keys_list, use_main, tiers[0]) if is_fail else []
+    bottleneck = None
+    if explain and is_fail:
+        bottleneck = quota_exact.bottleneck_report(s_m_keys, s_ex_keys, s_main_map, s_ex_maps, None if exact else group_tiers,
+                                                   enc=enc, cls=cls)
+        bottleneck['group_names'] = ['메인 쿼터'] + [cfg['name'] for cfg in ex_configs]
+    return {
+        'count': cnt, 'labels': labels, 'target_total': target_total, 'soft_target': soft_target, 'is_fail': is_fail,
+        'bound': pre['bound'], 'short_cells': pre['short_cells'], 'final_m': final_m, 'final_exs': final_exs,
+        'recs': recs, 'seed': None if exact else run_seed, 'warm': warm, 'exact_info': exact_info,
+        'm_keys': m_keys, 'ex_keys_list': ex_keys_list, 'cached': hit is not None,
+        'locked': n_locked, 'lock_over': locks['over'] if locks else [], 'unknown_ids': miss_in + miss_ex,
+        'bottleneck': bottleneck,
+    }
+
+def run_info_rows(res, iters, tol, backend, n_workers, time_limit, exact, priority_col=None, priority_high_first=True):
+    """Run_Info 시트 행 (항목, 값)"""
+    return [
+        ('솔버', "정확해 (최대유량 / 분기한정)" if exact else "랜덤 그리디 (Turbo)"),
+        ('난수 시드', res['seed'] if not exact else '-'),
+        ('병렬 방식', "프로세스 (멀티코어)" if backend == "processes" else "스레드"),
+        ('워커 수', n_workers or quota_engine.cpu_count()),
+        ('시도 횟수', iters if time_limit is None else '-'),
+        ('시간 제한(초)', time_limit if time_limit is not None else '-'),
+        ('허용 오차', tol),
+        ('intval 우선순위', f"{priority_col} ({'높은' if priority_high_first else '낮은'} 값 우선)" if priority_col is not None else '-'),
+        ('웜 스타트', 'Y (이전 결과에서 이어서 계산)' if res.get('warm') else 'N'),
+        ('매칭 수', res['count']),
+        ('재현 가능', 'Y' if exact else 'N (시간 제한 실행)' if not quota_engine.reproducible_run(res['seed'], time_limit) else 'N (웜 스타트)' if res.get('warm') else 'Y'),
+    ]
+
+def run_quota_file(data_path, spec_path, out_path, main_cols=None, id_col=None, iters=10000, tol=0, soft_groups=None, main_tier=0,
+                   out_format=None, **kwargs):
+    """
+    파일 경로만으로 할당을 실행하고 결과 파일을 저장합니다.
+    out_format: 'xlsx' / 'csv' / 'parquet' (생략 시 out_path 가 .zip 이면 csv 묶음, 아니면 xlsx)
+    main_cols 가 없으면 메인 쿼터 없이 추가 그룹만 사용 (전체 목표 = 메인 시트 목표 합)
+    id_col 이 없으면 데이터의 첫 번째 컬럼으로 정렬합니다.
+    soft_groups: {추가 그룹(시트) 이름: 소프트 우선순위}, main_tier: 메인 쿼터 등급 (0 = 하드)
+    반환: solve_quota 결과 dict
+    """
+    df = read_table(data_path)
+    main_map, ex_configs = load_quota_spec(spec_path, len(main_cols) if main_cols else 3)
+    use_main = bool(main_cols)
+    if use_main and not main_map:
+        raise ValueError(f"메인 쿼터 시트에 키 열 {len(main_cols)}개 + 목표 열이 없습니다: {spec_path}")
+    if not use_main:
+        main_map = {('All',): int(sum(main_map.values()))}
+    for cfg in ex_configs:
+        missing = [c for c in cfg['cols'] if c not in df.columns]
+        if missing:
+            raise ValueError(f"추가 쿼터 '{cfg['name']}' 의 변수가 데이터에 없습니다: {missing}")
+
+    soft_groups = soft_groups or {}
+    unknown = set(soft_groups) - {cfg['name'] for cfg in ex_configs}
+    if unknown:
+        raise ValueError(f"쿼터 파일에 없는 추가 그룹입니다: {sorted(unknown)}")
+    if soft_groups or main_tier:
+        kwargs['group_tiers'] = [main_tier] + [soft_groups.get(cfg['name'], 0) for cfg in ex_configs]
+
+    res = solve_quota(df, list(main_cols or []), main_map, ex_configs, iters=iters, tol=tol, use_main=use_main,
+                      id_col=id_col or df.columns[0], **kwargs)
+    out_format = out_format or ('csv' if str(out_path).lower().endswith('.zip') else 'xlsx')
+    args = (df, res['labels'], id_col or df.columns[0], res['recs'], use_main, main_map, res['final_m'], ex_configs, res['final_exs'])
+    extra = {
+        'run_info': run_info_rows(res, iters, tol, kwargs.get('backend', 'threads'), kwargs.get('n_workers'),
+                                  kwargs.get('time_limit'), kwargs.get('exact', False),
+                                  kwargs.get('priority_col'), kwargs.get('priority_high_first', True)),
+        'bottleneck': res['bottleneck'],
+    }
+    if out_format == 'xlsx':
+        quota_report.write_result_workbook(out_path, *args, **extra)
+    else:
+        quota_report.write_result_archive(out_path, *args, **extra, fmt=out_format)
+    return res
+
+
+# ==============================================================================
+# 3. 시나리오 일괄 실행
+# ==============================================================================
+def solve_scenarios(df, main_cols, ex_configs, scenarios, iters=10000, use_main=True, backend="threads", n_workers=None,
+                    seed=None, repair=True, priority_col=None, priority_high_first=True):
+    """
+    목표/허용 오차만 다른 여러 시나리오를 한 번에 계산합니다.
+    scenarios: [{'name', 'main_map', 'ex_maps' (생략 시 ex_configs 의 목표), 'tol'}]
+    키 추출 / 키 코드화 / 셀 인코딩 / 클래스 압축은 한 번만 하고, 탐색은 하나의 워커 풀에 시나리오 작업을 함께 넘깁니다.
+    반환: 시나리오별 dict (name, tol, count, labels, target_total, soft_target, is_fail, bound, recs, final_m, final_exs)
+    """
+    m_keys = quota_scoring.extract_main_keys(df, main_cols if use_main else [])
+    ex_keys_list = [quota_scoring.extract_extra_keys(df, cfg) for cfg in ex_configs]
+    basis = quota_scoring.score_basis(m_keys, ex_keys_list)
+
+    main_maps = [sc['main_map'] for sc in scenarios]
+    ex_maps_lists = [sc.get('ex_maps') or [cfg['map'] for cfg in ex_configs] for sc in scenarios]
+    scores_list = [quota_scoring.basis_scores(basis, mm, em, use_main=use_main) for mm, em in zip(main_maps, ex_maps_lists)]
+    if priority_col is not None:
+        rank = quota_scoring.priority_rank(df[priority_col], priority_high_first)
+        scores_list = [sc + quota_scoring.PRIORITY_WEIGHT * rank for sc in scores_list]
+
+    enc, caps, active = quota_engine.encode_scenarios(m_keys, ex_keys_list, main_maps, ex_maps_lists)
+    cls = quota_engine.compress_classes(enc['indptr'], enc['cells'], scores_list[0])
+    soft_targets, bounds, pres = [], [], []
+    for s, sc in enumerate(scenarios):
+        pre = quota_exact.feasibility_report({**enc, 'cap': caps[s], 'active': active[s]}, cls)
+        soft_targets.append(sum(main_maps[s].values()) - sc.get('tol', 0))
+        bounds.append(pre['bound']); pres.append(pre)
+    thresholds = [min(t, b) for t, b in zip(soft_targets, bounds)]
+
+    runs = quota_engine.run_scenarios(iters, df.index.to_numpy(), scores_list, enc, caps, thresholds,
+                                      n_workers=n_workers, backend=backend, repair=repair, seed=seed, cls=cls)
+
+    results = []
+    for s, (sc, (cnt, labels)) in enumerate(zip(scenarios, runs)):
+        labels = [int(idx) for idx in labels]
+        sc_configs = [{**cfg, 'map': m} for cfg, m in zip(ex_configs, ex_maps_lists[s])]
+        final_m, final_exs = quota_report.tally_selection(df.index, labels, m_keys, ex_keys_list)
+        is_fail = cnt < soft_targets[s]
+        recs = quota_report.shortage_records(main_maps[s], final_m, m_keys, sc_configs, final_exs, ex_keys_list, use_main) if is_fail else []
+        results.append({
+            'name': sc['name'], 'tol': sc.get('tol', 0), 'count': cnt, 'labels': labels,
+            'target_total': sum(main_maps[s].values()), 'soft_target': soft_targets[s], 'is_fail': is_fail,
+            'bound': bounds[s], 'short_cells': pres[s]['short_cells'], 'recs': recs, 'final_m': final_m, 'final_exs': final_exs,
+        })
+    return results
+
+def run_scenario_files(data_path, spec_paths, tols, out_path, main_cols=None, id_col=None, iters=10000, **kwargs):
+    """
+    쿼터 파일 여러 개 x 허용 오차 여러 개의 조합을 일괄 실행하고 비교 워크북을 저장합니다.
+    추가 그룹은 모든 쿼터 파일에서 같은 시트 이름 / 변수 구성이어야 합니다 (목표만 다를 수 있음).
+    """
+    df = read_table(data_path)
+    use_main = bool(main_cols)
+    specs = [(str(p), *load_quota_spec(p, len(main_cols) if main_cols else 3)) for p in spec_paths]
+    base_cfgs = specs[0][2]
+    layout = [(cfg['name'], tuple(cfg['cols']), cfg['mode']) for cfg in base_cfgs]
+    for path, _, cfgs in specs[1:]:
+        if [(cfg['name'], tuple(cfg['cols']), cfg['mode']) for cfg in cfgs] != layout:
+            raise ValueError(f"추가 쿼터 구성이 첫 번째 쿼터 파일과 다릅니다: {path}")
+
+    scenarios = []
+    for path, main_map, cfgs in specs:
+        if not use_main:
+            main_map = {('All',): int(sum(main_map.values()))}
+        for tol in tols:
+            name = f"{os.path.splitext(os.path.basename(path))[0]} / 오차 {tol}"
+            scenarios.append({'name': name, 'main_map': main_map, 'ex_maps': [cfg['map'] for cfg in cfgs], 'tol': tol})
+
+    results = solve_scenarios(df, list(main_cols or []), base_cfgs, scenarios, iters=iters, use_main=use_main, **kwargs)
+    quota_report.write_scenario_workbook(out_path, results)
+    return results
+
+
+# ==============================================================================
+# 4. 명령행 진입점
+# ==============================================================================
+def build_parser():
+    p = argparse.ArgumentParser(prog="quota", description="쿼터 자동 할당 (헤드리스)")
+    p.add_argument("data", help="설문 데이터 (csv / xlsx / xls)")
+    p.add_argument("spec", help="쿼터 파일 (xlsx: 첫 시트 메인 쿼터, 나머지 시트 추가 그룹)")
+    p.add_argument("-o", "--out", default="result.xlsx", help="결과 파일 경로 (기본: result.xlsx, .zip 이면 CSV 묶음)")
+    p.add_argument("--format", choices=["xlsx", "csv", "parquet"], help="결과 형식 (csv / parquet 은 시트별 파일 zip, 엑셀보다 빠름)")
+    p.add_argument("--main-cols", nargs="+", metavar="COL", help="메인 쿼터 키 열 순서대로 대응하는 데이터 변수 (개수 = 키 열 수, 생략 시 메인 쿼터 미사용)")
+    p.add_argument("--id-col", help="결과 정렬용 ID 컬럼 (기본: 첫 번째 컬럼)")
+    p.add_argument("--iters", type=int, default=10000, help="시도 횟수 (기본: 10000)")
+    p.add_argument("--tol", type=int, default=0, help="허용 오차 (기본: 0)")
+    p.add_argument("--time-limit", type=float, help="탐색 시간 제한(초) - 지정 시 시도 횟수 대신 사용")
+    p.add_argument("--seed", type=int, help="난수 시드 (생략 시 자동 생성, Run_Info 시트에 기록)")
+    p.add_argument("--backend", choices=["threads", "processes"], default="threads", help="병렬 방식 (기본: threads)")
+    p.add_argument("--workers", type=int, help="워커 수 (기본: CPU 코어 수)")
+    p.add_argument("--no-repair", action="store_true", help="로컬 서치 보정 생략")
+    p.add_argument("--exact", action="store_true", help="정확해 솔버 사용")
+    p.add_argument("--exact-limit", type=float, default=60.0, help="정확해 시간 제한(초) (기본: 60)")
+    p.add_argument("--cache", action="store_true", help="디스크 결과 캐시 사용 (같은 데이터/목표/옵션이면 저장된 결과 사용)")
+    p.add_argument("--cache-dir", help=f"결과 캐시 폴더 (기본: {quota_cache.DEFAULT_DIR}, 현재 사용자 전용 0700)")
+    p.add_argument("--cache-reuse", action="store_true", help="시드를 지정하지 않은 실행과 시간 제한 실행도 저장된 결과 사용 (기본: 시도 횟수 기준 시드 지정 / 정확해 실행만)")
+    p.add_argument("--soft", nargs="+", metavar="GROUP[:P]", help="소프트 쿼터로 둘 추가 그룹(시트 이름)과 우선순위 (1 = 가장 중요, 기본 1)")
+    p.add_argument("--main-soft", type=int, metavar="P", help="메인 쿼터를 소프트 우선순위 P 로 계산 (전체 목표 인원은 유지)")
+    p.add_argument("--include", metavar="IDS", help="고정 포함 ID (파일 경로 csv/xlsx/txt 첫 컬럼, 또는 쉼표 구분 목록)")
+    p.add_argument("--exclude", metavar="IDS", help="제외 ID (파일 경로 csv/xlsx/txt 첫 컬럼, 또는 쉼표 구분 목록)")
+    p.add_argument("--intval", metavar="COL", help="보조 우선순위(intval) 컬럼 - 희소성이 같은 응답자 중 값이 높은 응답자 우선")
+    p.add_argument("--intval-low-first", action="store_true", help="intval 값이 낮은 응답자 우선")
+    p.add_argument("--explain", action="store_true", help="목표 미달 시 병목 진단 (경합 셀 / 추가 모집 효과 / 묶인 셀 시트 추가)")
+    p.add_argument("--scenario", nargs="+", metavar="SPEC", help="비교할 쿼터 파일 추가 (시나리오 일괄 실행 - 결과는 비교 시트만 저장)")
+    p.add_argument("--tols", nargs="+", type=int, metavar="TOL", help="비교할 허용 오차 목록 (시나리오 일괄 실행)")
+    return p
+
+def parse_soft_groups(items):
+    """['브랜드:2', '지역'] -> {'브랜드': 2, '지역': 1}"""
+    out = {}
+    for item in items or []:
+        name, _, prio = item.rpartition(':') if ':' in item else (item, '', '1')
+        out[name] = max(1, int(prio))
+    return out
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.scenario or args.tols:
+        if args.exact or args.time_limit is not None:
+            raise SystemExit("시나리오 일괄 실행은 랜덤 그리디 + 시도 횟수 기준만 지원합니다.")
+        results = run_scenario_files(
+            args.data, [args.spec] + (args.scenario or []), args.tols or [args.tol], args.out,
+            main_cols=args.main_cols, id_col=args.id_col, iters=args.iters,
+            backend=args.backend, n_workers=args.workers, seed=args.seed, repair=not args.no_repair,
+            priority_col=args.intval, priority_high_first=not args.intval_low_first
+        )
+        for r in results:
+            print(f"[{r['name']}] 매칭 {r['count']:,}명 / 목표 {r['soft_target']:,}명 - 상한 {r['bound']:,}명, 부족 셀 {len(r['recs'])}개")
+        print(f"결과 저장: {args.out}")
+        return 1 if any(r['is_fail'] for r in results) else 0
+
+    res = run_quota_file(
+        args.data, args.spec, args.out, main_cols=args.main_cols, id_col=args.id_col,
+        iters=0 if args.time_limit is not None else args.iters, tol=args.tol,
+        backend=args.backend, n_workers=args.workers, seed=args.seed, repair=not args.no_repair,
+        time_limit=args.time_limit, exact=args.exact, exact_limit=args.exact_limit,
+        priority_col=args.intval, priority_high_first=not args.intval_low_first,
+        use_cache=args.cache or args.cache_dir is not None or args.cache_reuse, cache_dir=args.cache_dir, reuse_auto=args.cache_reuse,
+        soft_groups=parse_soft_groups(args.soft), main_tier=args.main_soft or 0,
+        include_ids=read_id_list(args.include), exclude_ids=read_id_list(args.exclude), explain=args.explain,
+        out_format=args.format
+    )
+    rate = res['count'] / max(res['target_total'], 1) * 100
+    print(f"매칭 {res['count']:,}명 / 목표 {res['target_total']:,}명 ({rate:.1f}%) - 상한 {res['bound']:,}명")
+    if res['seed'] is not None:
+        print(f"난수 시드: {res['seed']}")
+    info = res['exact_info']
+    if info and not info['optimal']:
+        print(f"정확해 최적 미증명 - 상한 {info['bound']:,}명"
+              + (" (복수응답 중복 키: 목표를 넘기지 않는 기준의 해, 상한은 그리디 기준)" if info.get('dup_keys') else ""))
+    if res['cached']:
+        print("저장된 결과 사용 (결과 캐시 적중)")
+    if res['locked']:
+        print(f"고정 포함 {res['locked']:,}명 (목표 초과 셀 {len(res['lock_over'])}개)")
+    if res['unknown_ids']:
+        print(f"데이터에 없는 ID {len(res['unknown_ids'])}개: {', '.join(res['unknown_ids'][:10])}")
+    for r in res['recs']:
+        print(f"  부족 [{r['구분']}] {r['항목']}: {r['현재']}/{r['목표']} ({r['진단']})")
+    if res['bottleneck']:
+        names = res['bottleneck']['group_names']
+        for r in res['bottleneck']['rivals'][:10]:
+            print(f"  경합 [{names[r['group']]}] {quota_report.key_label(r['key'])} <- [{names[r['rival_group']]}] "
+                  f"{quota_report.key_label(r['rival_key'])}: 막힌 후보 {r['contested']}명")
+    print(f"결과 저장: {args.out}")
+    return 1 if res['is_fail'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1012 @@
+"""
+쿼터 솔루션 엔진 (Streamlit 비의존 모듈)
+
+프로세스 워커가 streamlit 을 import 하지 않도록 솔버 로직을 utils.py 에서 분리했습니다.
+utils.simulation_worker 는 이 모듈의 함수를 그대로 재노출합니다.
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import collections
+import numpy as np
+from joblib import Parallel, delayed, cpu_count
+
+# 병렬 실행 방식: 화면/호출부에서 쓰는 이름 -> joblib backend
+BACKENDS = {"threads": "threading", "processes": "loky"}
+
+# 노이즈 정렬 블록 크기: 블록당 원소 수 상한(float64 기준 약 8MB)과 순서 수 상한
+ORDER_BLOCK_ELEMS = 1_000_000
+ORDER_BLOCK_MAX = 256
+
+# 메인 쿼터 밀집 텐서 칸 수 상한: 축 값 조합이 이보다 많으면 튜플 dict 조회로 대체
+MAX_TENSOR_CELLS = 10_000_000
+
+# 재현 실행의 보정 단계 한도: repair_time 초를 '클래스 수 x 이동 수' 작업량으로 환산 (시계 대신 결정적 한도)
+# 이동 1회 비용은 대략 클래스 수에 비례 (1만 클래스에서 약 2000 이동 = 10초 내외)
+REPAIR_SCAN_RATE = 2_000_000
+REPAIR_MIN_MOVES = 200
+
+
+# ==============================================================================
+# 1. 쿼터 셀 인코딩 (정수 ID + CSR)
+# ==============================================================================
+# 셀 0 은 '차단' 셀(용량 0): 메인 쿼터에 없는 키를 가진 응답자는 이 셀에 소속되어 절대 선택되지 않음
+BLOCKED_CELL = 0
+
+def _to_cap(v):
+    """목표값을 정수 용량으로 변환 (NaN/음수 -> 0, 소수점 -> 올림: 기존 '> 0' 비교와 동일한 선택 수)"""
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return 0
+    if not np.isfinite(v) or v <= 0:
+        return 0
+    return int(np.ceil(v))
+
+def encode_quota(m_keys, ex_keys_list, main_map, ex_maps_list):
+    """
+    메인/추가 쿼터의 모든 셀을 밀집 정수 ID로 한 번만 인코딩합니다.
+    반환 dict:
+      cap        : 셀별 용량 (np.int64)
+      indptr     : 응답자별 소속 셀 범위 (CSR, np.int64, 길이 N+1)
+      cells      : 소속 셀 ID (CSR, np.int32) - 목표가 없는 추가 쿼터 키는 제약이 없으므로 제외
+      cell_keys  : 셀 ID -> (그룹 번호, 키)  (그룹 0 = 메인, j+1 = 추가 j)
+    """
+    cell_keys = [(None, None)]
+    caps = [0]
+    group_ids = []
+    for g, q_map in enumerate([main_map] + list(ex_maps_list)):
+        ids = {}
+        for k, v in q_map.items():
+            ids[k] = len(cell_keys)
+            cell_keys.append((g, k))
+            caps.append(_to_cap(v))
+        group_ids.append(ids)
+
+    main_cells = main_cell_ids(m_keys, main_map, group_ids[0])
+    n = len(m_keys)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    flat = []
+    for i in range(n):
+        flat.append(main_cells[i])
+        for j, ex_key_list in enumerate(ex_keys_list):
+            ids = group_ids[j + 1]
+            for k in ex_key_list[i]:
+                c = ids.get(k)
+                if c is not None:
+                    flat.append(c)
+        indptr[i + 1] = len(flat)
+
+    return {
+        'cap': np.asarray(caps, dtype=np.int64),
+        'indptr': indptr,
+        'cells': np.asarray(flat, dtype=np.int32),
+        'cell_keys': cell_keys,
+    }
+
+def with_caps(enc, main_map, ex_maps_list):
+    """
+    encode_quota 결과에 새 목표 용량만 반영합니다 (셀 ID 는 목표 dict 의 키 순서로 정해지므로 키 구성이 같아야 함).
+    목표 값만 바뀐 재계산에서 응답자별 셀 인코딩을 다시 하지 않습니다.
+    """
+    caps = [0] + [_to_cap(v) for q_map in [main_map] + list(ex_maps_list) for v in q_map.values()]
+    return {**enc, 'cap': np.asarray(caps, dtype=np.int64)}
+
+def main_tensor(main_map):
+    """
+    N차원 메인 쿼터 목표 -> 밀집 텐서 (축별 정수 코드 + 혼합 기수 평탄 인덱스)
+    반환 dict: axes (축별 {값: 코드}), shape, strides, target (평탄 np.int64, 목표 없는 칸 = -1)
+    키 길이가 섞여 있거나 칸 수가 MAX_TENSOR_CELLS 를 넘으면 None
+    """
+    keys = list(main_map)
+    if not keys or len({len(k) for k in keys}) != 1:
+        return None
+    n_dims = len(keys[0])
+    axes = [{} for _ in range(n_dims)]
+    for k in keys:
+        for d, v in enumerate(k):
+            axes[d].setdefault(v, len(axes[d]))
+    shape = tuple(len(a) for a in axes)
+    size = int(np.prod(shape, dtype=np.float64))
+    if size > MAX_TENSOR_CELLS:
+        return None
+    strides = np.ones(n_dims, dtype=np.int64)
+    for d in range(n_dims - 2, -1, -1):
+        strides[d] = strides[d + 1] * shape[d + 1]
+    tensor = {'axes': axes, 'shape': shape, 'strides': strides, 'target': np.full(size, -1, dtype=np.int64)}
+    tensor['target'][tensor_index(tensor, keys)] = [_to_cap(main_map[k]) for k in keys]
+    return tensor
+
+def tensor_index(tensor, m_keys):
+    """
+    메인 키 튜플 -> 텐서 평탄 인덱스 (np.int64, 축에 없는 값이 하나라도 있으면 -1)
+    축마다 고유값만 코드로 바꾼 뒤 sum(코드 x 자리값) 으로 계산하므로 행별 튜플 해싱이 없습니다.
+    """
+    n = len(m_keys)
+    flat = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        return flat
+    if any(len(k) != len(tensor['axes']) for k in set(m_keys)):
+        return np.full(n, -1, dtype=np.int64)
+    valid = np.ones(n, dtype=bool)
+    for d, (axis, col) in enumerate(zip(tensor['axes'], zip(*m_keys))):
+        uniq, inv = np.unique(np.asarray(col, dtype=object).astype(str), return_inverse=True)
+        codes = np.array([axis.get(u, -1) for u in uniq], dtype=np.int64)[inv.ravel()]
+        valid &= codes >= 0
+        flat += codes * tensor['strides'][d]
+    flat[~valid] = -1
+    return flat
+
+def main_cell_ids(m_keys, main_map, main_ids):
+    """응답자별 메인 셀 ID (np.int64). 목표에 없는 키 -> BLOCKED_CELL"""
+    tensor = main_tensor(main_map)
+    if tensor is None or any(not isinstance(v, str) for k in main_ids for v in k):
+        return np.array([main_ids.get(k, BLOCKED_CELL) for k in m_keys], dtype=np.int64)
+    cell_of = np.full(len(tensor['target']) + 1, BLOCKED_CELL, dtype=np.int64)   # 마지막 칸 = 인덱스 -1
+    cell_of[tensor_index(tensor, list(main_ids))] = list(main_ids.values())
+    return cell_of[tensor_index(tensor, m_keys)]
+
+def row_members(indptr, cells):
+    """CSR -> 응답자별 셀 ID 튜플 리스트 (워커당 한 번만 생성)"""
+    ip = np.asarray(indptr).tolist()
+    cl = np.asarray(cells).tolist()
+    return [tuple(cl[ip[i]:ip[i + 1]]) for i in range(len(ip) - 1)]
+
+
+def compress_classes(indptr, cells, scores):
+    """
+    소속 셀 구성이 완전히 같은 응답자를 동치 클래스로 묶습니다.
+    반환 dict:
+      class_indptr / class_cells : 클래스별 소속 셀 (CSR, 중복 소속 포함)
+      class_counts               : 클래스 인원 수
+      class_scores               : 클래스 대표 점수 (구성원 평균)
+      class_start / class_rows   : 클래스별 구성원 위치 (점수 내림차순, 전개용)
+    """
+    ip = np.asarray(indptr).tolist()
+    cl = np.asarray(cells).tolist()
+    n = len(ip) - 1
+    sig_ids = {}
+    row_class = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        sig = tuple(sorted(cl[ip[i]:ip[i + 1]]))
+        row_class[i] = sig_ids.setdefault(sig, len(sig_ids))
+
+    n_cls = len(sig_ids)
+    class_counts = np.bincount(row_class, minlength=n_cls).astype(np.int64)
+    class_scores, class_rows = class_order(row_class, class_counts, scores)
+    class_start = np.zeros(n_cls + 1, dtype=np.int64)
+    np.cumsum(class_counts, out=class_start[1:])
+
+    class_indptr = np.zeros(n_cls + 1, dtype=np.int64)
+    flat = []
+    for k, sig in enumerate(sig_ids):
+        flat.extend(sig)
+        class_indptr[k + 1] = len(flat)
+
+    return {
+        'class_indptr': class_indptr,
+        'class_cells': np.asarray(flat, dtype=np.int32),
+        'class_counts': class_counts,
+        'class_scores': class_scores,
+        'class_start': class_start,
+        'class_rows': class_rows,
+        'row_class': row_class,
+    }
+
+def class_order(row_class, class_counts, scores):
+    """
+    점수에 따라 달라지는 클래스 정보만 계산합니다 (시나리오마다 점수가 바뀌어도 클래스 구성은 재사용).
+    반환: (class_scores 구성원 평균 점수, class_rows 클래스 순 + 클래스 안에서는 점수 높은 순, 동점은 원래 위치 순)
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    class_scores = np.bincount(row_class, weights=scores, minlength=len(class_counts)) / np.maximum(class_counts, 1)
+    class_rows = np.lexsort((np.arange(len(scores)), -scores, row_class)).astype(np.int64)
+    return class_scores, class_rows
+
+def reorder_classes(cls, scores):
+    """compress_classes 결과에 새 점수만 반영 (클래스 구성은 셀 소속에만 의존하므로 재사용)"""
+    class_scores, class_rows = class_order(cls['row_class'], cls['class_counts'], scores)
+    return {**cls, 'class_scores': class_scores, 'class_rows': class_rows}
+
+def class_members(class_indptr, class_cells):
+    """클래스 CSR -> 클래스별 ((셀, 1인당 차감량), ...) 튜플 리스트"""
+    out = []
+    for cs in row_members(class_indptr, class_cells):
+        mult = {}
+        for c in cs:
+            mult[c] = mult.get(c, 0) + 1
+        out.append(tuple(mult.items()))
+    return out
+
+def takes_from_positions(positions, row_class):
+    """응답자 위치 리스트 -> 클래스별 선택 인원 [(클래스, 인원)]"""
+    if len(positions) == 0:
+        return []
+    cnt = np.bincount(np.asarray(row_class)[np.asarray(positions, dtype=np.int64)])
+    return [(k, int(t)) for k, t in enumerate(cnt.tolist()) if t > 0]
+
+def fit_takes(cap, class_indptr, class_cells, takes, class_scores):
+    """
+    이전 선택 [(클래스, 인원)] 을 새 용량에 맞춥니다 (웜 스타트).
+    용량을 넘는 셀에서만, 그 셀에 속한 클래스 중 점수가 낮은 클래스부터 필요한 인원만 뺍니다.
+    빈 용량 채우기는 repair_takes 가 담당합니다.
+    """
+    members = class_members(class_indptr, class_cells)
+    x = dict(takes)
+    used = np.zeros(len(cap), dtype=np.int64)
+    for k, t in x.items():
+        for c, m in members[k]:
+            used[c] += m * t
+    cap = np.asarray(cap, dtype=np.int64)
+    for c in np.flatnonzero(used > cap).tolist():
+        for k in sorted((k for k in x if x[k] > 0 and any(cc == c for cc, _ in members[k])), key=lambda k: class_scores[k]):
+            excess = used[c] - cap[c]
+            if excess <= 0:
+                break
+            m = dict(members[k])[c]
+            drop = min(x[k], -(-excess // m))
+            x[k] -= drop
+            for cc, mm in members[k]:
+                used[cc] -= mm * drop
+    return [(k, t) for k, t in x.items() if t > 0]
+
+def expand_classes(takes, class_start, class_rows, prefer=None):
+    """
+    클래스별 선택 인원 [(클래스, 인원)] -> 응답자 위치 리스트 (클래스 내 점수 상위부터)
+    prefer: 우선 선택할 위치 집합 (웜 스타트 시 이전 선택 유지)
+    """
+    out = []
+    for k, t in takes:
+        rows = np.asarray(class_rows[int(class_start[k]):int(class_start[k + 1])]).tolist()
+        if prefer:
+            rows = [r for r in rows if r in prefer] + [r for r in rows if r not in prefer]
+        out.extend(rows[:t])
+    return out
+
+# ==============================================================================
+# 1-1. 고정 포함 / 제외 응답자
+# ==============================================================================
+def apply_locks(m_keys, ex_keys_list, main_map, ex_maps_list, include_positions=(), exclude_positions=()):
+    """
+    고정 포함 응답자의 셀 사용량을 목표에서 한 번만 미리 빼고, 포함/제외 응답자를 탐색 대상에서 뺍니다.
+    (탐색 반복이 이들을 다시 평가하지 않도록 인코딩 전에 제거)
+    반환 dict:
+      keep                 : 탐색 대상 위치 (원래 위치 기준 np.int64)
+      locked               : 고정 포함 위치 리스트
+      m_keys, ex_keys_list : 탐색 대상 응답자의 키
+      main_map, ex_maps_list: 고정 포함 인원을 뺀 남은 목표 (음수는 0)
+      over                 : 고정 포함만으로 목표를 넘은 셀 [(그룹, 키, 목표, 고정 인원)]
+    """
+    locked = sorted(set(int(p) for p in include_positions))
+    excluded = set(int(p) for p in exclude_positions)
+    both = excluded.intersection(locked)
+    if both:
+        raise ValueError(f"고정 포함과 제외에 동시에 지정된 응답자가 있습니다: {len(both)}명")
+
+    used = [collections.Counter() for _ in range(len(ex_keys_list) + 1)]
+    for p in locked:
+        used[0][m_keys[p]] += 1
+        for j, k_list in enumerate(ex_keys_list):
+            used[j + 1].update(k_list[p])
+
+    over = []
+    rem_maps = []
+    for g, q_map in enumerate([main_map] + list(ex_maps_list)):
+        rem = {}
+        for k, v in q_map.items():
+            cap = _to_cap(v)
+            u = used[g].get(k, 0)
+            if u > cap:
+                over.append((g, k, cap, u))
+            rem[k] = max(0, cap - u)
+        rem_maps.append(rem)
+
+    drop = excluded.union(locked)
+    keep = np.array([i for i in range(len(m_keys)) if i not in drop], dtype=np.int64)
+    kl = keep.tolist()
+    return {
+        'keep': keep,
+        'locked': locked,
+        'm_keys': [m_keys[i] for i in kl],
+        'ex_keys_list': [[k_list[i] for i in kl] for k_list in ex_keys_list],
+        'main_map': rem_maps[0],
+        'ex_maps_list': rem_maps[1:],
+        'over': over,
+    }
+
+
+# ==============================================================================
+# 2. 배열 기반 그리디 커널
+# ==============================================================================
+def greedy_kernel(order, cap_list, members):
+    """
+    order 순서대로 모든 소속 셀에 잔여 용량이 있으면 선택하고 차감합니다.
+    잔여 용량은 반복마다 용량 배열의 복사본 하나로만 관리합니다.
+    (CPython 에서는 numpy 스칼라 인덱싱보다 list 인덱싱이 빠르므로 커널 안에서는 list 사본 사용)
+    """
+    rem = cap_list.copy()
+    selected = []
+    for r in order:
+        cs = members[r]
+        for c in cs:
+            if rem[c] <= 0:
+                break
+        else:
+            for c in cs:
+                rem[c] -= 1
+            selected.append(r)
+    return len(selected), selected
+
+def class_greedy_kernel(order, cap_list, members, counts):
+    """
+    클래스 단위 그리디: 클래스마다 한 번에 가능한 최대 인원을 배정합니다.
+    1인당 같은 셀을 m번 차감하는 경우, 잔여 r 에서 'r > 0 이면 선택' 규칙으로 받을 수 있는 인원은 ceil(r/m).
+    """
+    rem = cap_list.copy()
+    takes = []
+    total = 0
+    for k in order:
+        t = counts[k]
+        for c, m in members[k]:
+            r = rem[c]
+            if r <= 0:
+                t = 0
+                break
+            if m != 1:
+                r = -(-r // m)
+            if r < t:
+                t = r
+        if t:
+            for c, m in members[k]:
+                rem[c] -= t * m
+            takes.append((k, t))
+            total += t
+    return total, takes
+
+def tiered_class_greedy_kernel(order, cap_list, members, counts, relax):
+    """
+    하드/소프트 등급 그리디: 모든 셀을 지키는 그리디로 시작해, relax 의 단계마다 해당 소프트 셀들의
+    용량 제한을 풀고(우선순위가 낮은 등급부터) 같은 순서로 남은 인원을 이어서 채웁니다.
+    하드 셀은 끝까지 지키므로 하드 충족이 최대한 늘어나고, 소프트 셀은 가능한 한 목표 안에서 채워집니다.
+    반환: (매칭 수, [(클래스, 인원)], 첫 단계 매칭 수, 첫 단계 [(클래스, 인원)])
+          첫 단계 = 소프트 셀도 모두 지킨 결과 (전체 하드 그리디와 같음, 보정 시작점으로 사용)
+    """
+    rem = cap_list.copy()
+    x = {}
+    total = 0
+    strict = None
+    for step in [()] + list(relax):
+        if strict is None and step:
+            strict = (total, list(x.items()))
+        for c in step:
+            rem[c] = sys.maxsize
+        for k in order:
+            t = counts[k] - x.get(k, 0)
+            if t <= 0:
+                continue
+            for c, m in members[k]:
+                r = rem[c]
+                if r <= 0:
+                    t = 0
+                    break
+                if m != 1:
+                    r = -(-r // m)
+                if r < t:
+                    t = r
+            if t:
+                for c, m in members[k]:
+                    rem[c] -= t * m
+                x[k] = x.get(k, 0) + t
+                total += t
+    if strict is None:
+        strict = (total, list(x.items()))
+    return (total, list(x.items())) + strict
+
+def noisy_orders(scores, iters, block_size=None, sigma=0.5, rng=None):
+    """
+    노이즈 정렬 순서를 블록 단위로 생성합니다.
+    (block_size x n) 노이즈 행렬을 한 번에 만들고 axis=1 argsort 한 번으로 block_size 개의 순서를 얻습니다.
+    난수 소비 순서가 반복별 생성과 같으므로 같은 시드면 같은 순서가 나옵니다.
+    rng: np.random.Generator (None 이면 기존 호환용 전역 np.random 상태 사용)
+    """
+    rng = np.random if rng is None else rng
+    n = len(scores)
+    if block_size is None:
+        block_size = max(1, min(ORDER_BLOCK_MAX, ORDER_BLOCK_ELEMS // max(n, 1)))
+    neg_scores = -np.asarray(scores, dtype=np.float64)
+    done = 0
+    while done < iters:
+        b = min(block_size, iters - done)
+        # -(점수 + 노이즈) 오름차순 = 내림차순 (역순 뷰 없이 연속 메모리로 정렬)
+        noisy = rng.normal(0, sigma, (b, n))
+        np.subtract(neg_scores, noisy, out=noisy)
+        yield from np.argsort(noisy, axis=1).tolist()
+        done += b
+
+def _search_loop(worker_id, iters, scores, kernel, target_threshold, deadline=None, store=None, to_vector=None, rng=None, stop_on_shared=True, objective=None, target_value=None):
+    """
+    노이즈 정렬 + 커널 반복 공통 루프.
+    deadline: time.time() 기준 종료 시각 (None 이면 iters 만큼만 반복)
+    store: 진행 상황 공유 배열 (make_progress_store) - 개선 시 자기 슬롯에 최고 결과를 게시하고,
+           stop_on_shared 이면 다른 워커가 목표에 도달했을 때 즉시 멈춤
+    rng: 워커 전용 np.random.Generator
+    objective: objective(selected) -> 비교 가능한 값 (None 이면 매칭 수). target_value 이상이면 종료
+    """
+    best_cnt = -1
+    best_val = None
+    best = []
+    if objective is None:
+        target_value = target_threshold
+
+    # 1. 셔플 (노이즈 추가) 후 점수 내림차순 - 블록 단위로 미리 생성
+    for it, current_order in enumerate(noisy_orders(scores, iters, rng=rng)):
+        if deadline is not None and time.time() > deadline:
+            break
+        if store is not None and stop_on_shared and store[:, 1].max() >= target_threshold:
+            break
+
+        # 2. 그리디 매칭 (완료한 반복 수를 게시)
+        cnt, selected = kernel(current_order)
+        if store is not None:
+            store[worker_id, 2] = it + 1
+        val = cnt if objective is None else objective(selected)
+        if best_val is None or val > best_val:
+            best_cnt = cnt
+            best_val = val
+            best = selected
+            if store is not None:
+                publish_progress(store, worker_id, cnt, to_vector(selected))
+            if best_val >= target_value:
+                break
+
+    return best_cnt, best
+
+def class_worker(worker_id, iters, class_scores, cap, class_indptr, class_cells, class_counts, target_threshold, deadline=None, store=None, rng=None, stop_on_shared=True, tiers=None):
+    """
+    클래스 단위로 노이즈 정렬 + 그리디를 반복하고 최고 결과 [(클래스, 인원)] 를 반환
+    tiers: tier_plan 결과 - 지정 시 등급 그리디 + (하드 충족, 소프트 등급별 충족) 사전식 비교.
+           이때는 (매칭 수, 최고 결과, 첫 단계(모든 셀 준수) 최고 결과) 를 반환합니다.
+    """
+    cap_list = np.asarray(cap).tolist()
+    members = class_members(class_indptr, class_cells)
+    counts = np.asarray(class_counts).tolist()
+
+    def to_vector(takes):
+        v = np.zeros(len(counts), dtype=np.int64)
+        for k, t in takes: v[k] = t
+        return v
+
+    if tiers is None:
+        kernel = lambda order: class_greedy_kernel(order, cap_list, members, counts)
+        objective = target_value = None
+    else:
+        strict_best = [-1, []]
+        def kernel(order):
+            total, takes, s_total, s_takes = tiered_class_greedy_kernel(order, cap_list, members, counts, tiers['relax'])
+            if s_total > strict_best[0]:
+                strict_best[:] = [s_total, s_takes]
+            return total, takes
+        objective = lambda takes: tier_objective(takes, members, cap_list, tiers)
+        target_value = (target_threshold,) + tuple(tiers['soft_totals'])
+    res = _search_loop(
+        worker_id, iters, np.asarray(class_scores, dtype=np.float64), kernel,
+        target_threshold, deadline, store, to_vector, rng, stop_on_shared, objective, target_value
+    )
+    return res if tiers is None else res + (strict_best[1],)
+
+def encoded_worker(worker_id, iters, scores, cap, indptr, cells, target_threshold, deadline=None, store=None, rng=None, stop_on_shared=True):
+    """인코딩된 배열만으로 노이즈 정렬 + 그리디를 반복하고 최고 결과(위치 리스트)를 반환"""
+    cap_list = np.asarray(cap).tolist()
+    members = row_members(indptr, cells)
+
+    def to_vector(selected):
+        v = np.zeros(len(members), dtype=np.int64)
+        v[selected] = 1
+        return v
+
+    return _search_loop(
+        worker_id, iters, np.asarray(scores, dtype=np.float64),
+        lambda order: greedy_kernel(order, cap_list, members),
+        target_threshold, deadline, store, to_vector, rng, stop_on_shared
+    )
+
+
+# ==============================================================================
+# 3. 기존 호출 호환 워커
+# ==============================================================================
+def simulation_worker(worker_id, iters, indices, scores, m_keys, ex_keys_list, main_map, ex_maps_list, target_threshold):
+    """
+    [안전장치 추가됨]
+    indices: 원본 데이터프레임의 인덱스 라벨 (예: 1001, 1002...)
+    m_keys, ex_keys_list: 0번부터 순서대로 정렬된 리스트
+    내부적으로 encode_quota 후 배열 커널(encoded_worker)로 실행합니다.
+    """
+    enc = encode_quota(m_keys, ex_keys_list, main_map, ex_maps_list)
+    best_cnt, best_pos = encoded_worker(worker_id, iters, scores, enc['cap'], enc['indptr'], enc['cells'], target_threshold)
+    # [중요] 결과에는 원본 데이터프레임의 '라벨 인덱스'를 저장
+    return best_cnt, [indices[p] for p in best_pos]
+
+def _process_worker(worker, worker_id, *args, **kwargs):
+    """프로세스 워커: 배열 인자는 joblib 이 memmap(공유 메모리)으로 전달합니다. (난수는 rng 인자로 워커별 독립)"""
+    return worker(worker_id, *args, **kwargs)
+
+
+# ==============================================================================
+# 4. 로컬 서치 보정 (1-for-1 / 2-for-1 스왑)
+# ==============================================================================
+def repair_takes(cap, class_indptr, class_cells, class_counts, takes, target=None, max_passes=200, stall_passes=10, time_limit=10.0, plateau_moves=20, seed=None, max_moves=None):
+    """
+    그리디 결과 [(클래스, 인원)] 를 스왑으로 개선합니다.
+    - 2-for-1: 선택된 1명을 빼고 풀린 셀로 2명 이상을 넣을 수 있으면 확정 (+1 이상)
+    - 1-for-1: 개선이 없을 때 같은 셀을 공유하는 다른 클래스로 교체 (평지 이동, 직전 교체는 타부)
+    셀별 잔여 용량 배열을 이동마다 해당 클래스의 소속 셀만큼만 갱신합니다.
+    target 도달, stall_passes 연속 무개선, 시간 한도, 이동 한도 중 먼저 오는 시점에 멈춥니다.
+    time_limit=None 이면 시간과 무관하게 max_moves (시도한 2-for-1 / 1-for-1 이동 수) 로만 멈추므로
+    같은 seed 면 항상 같은 결과를 돌려줍니다.
+    반환: 개선된 [(클래스, 인원)]
+    """
+    deadline = None if time_limit is None else time.time() + time_limit
+    budget = [sys.maxsize if max_moves is None else int(max_moves)]
+    def spent():
+        # 이동 1회 차감 후 한도(시간 / 이동 수) 초과 여부
+        budget[0] -= 1
+        return budget[0] < 0 or (deadline is not None and time.time() > deadline)
+
+    rng = np.random.default_rng(seed)
+    members = class_members(class_indptr, class_cells)
+    counts = np.asarray(class_counts).tolist()
+    n_cls = len(counts)
+    rem = np.asarray(cap).tolist()
+    x = [0] * n_cls
+    for k, t in takes:
+        x[k] += t
+        for c, m in members[k]:
+            rem[c] -= m * t
+    cell_classes = [[] for _ in rem]
+    max_mult = [1] * len(rem)
+    for k, mem in enumerate(members):
+        for c, m in mem:
+            cell_classes[c].append(k)
+            if m > max_mult[c]: max_mult[c] = m
+
+    def room(k):
+        # 현재 잔여 용량으로 클래스 k 에 더 넣을 수 있는 인원
+        t = counts[k] - x[k]
+        for c, m in members[k]:
+            q = rem[c] // m if rem[c] > 0 else 0
+            if q < t:
+                t = q
+        return t
+
+    def move(k, t):
+        x[k] += t
+        for c, m in members[k]:
+            rem[c] -= m * t
+
+    def fill(cands):
+        added = []
+        for k in cands:
+            t = room(k)
+            if t > 0:
+                move(k, t); added.append((k, t))
+        return added
+
+    nb_cache = {}
+    def neighbours(k):
+        # 클래스 k 와 셀을 공유하는 클래스 (제거 시 혜택을 볼 수 있는 후보)
+        if k not in nb_cache:
+            seen = set()
+            for c, _ in members[k]:
+                seen.update(cell_classes[c])
+            seen.discard(k)
+            nb_cache[k] = sorted(seen)
+        return nb_cache[k]
+
+    def blocking(k):
+        # 클래스 k 의 셀 중 하나라도 꽉 차 있어야 제거로 다른 클래스가 풀릴 수 있음
+        return any(rem[c] < max_mult[c] for c, _ in members[k])
+
+    fill(range(n_cls))
+    best_x = list(x); best_total = total = sum(x)
+    tabu = collections.deque(maxlen=max(5, plateau_moves))
+    stall = 0
+
+    for _ in range(max_passes):
+        if budget[0] <= 0 or (deadline is not None and time.time() > deadline) or stall >= stall_passes: break
+        if target is not None and best_total >= target: break
+        improved = False
+        # 2-for-1: 한 명 제거 -> 풀린 셀을 공유하는 클래스로 채우기
+        for a in rng.permutation(n_cls).tolist():
+            if x[a] == 0 or not blocking(a): continue
+            if spent(): break
+            move(a, -1)
+            added = fill([b for b in neighbours(a) if x[b] < counts[b]])
+            gain = sum(t for _, t in added)
+            if gain >= 2:
+                total += gain - 1; improved = True
+            else:
+                for k, t in added: move(k, -t)
+                move(a, 1)
+        if total > best_total:
+            best_total = total; best_x = list(x); stall = 0
+        if improved:
+            continue
+
+        # 1-for-1 평지 이동: 개선이 없을 때 탐색 영역 이동
+        for _ in range(plateau_moves):
+            if spent(): break
+            selected = [k for k in range(n_cls) if x[k] > 0 and k not in tabu]
+            if not selected: break
+            a = selected[int(rng.integers(len(selected)))]
+            move(a, -1)
+            cands = [b for b in neighbours(a) if x[b] < counts[b] and b not in tabu and room(b) > 0]
+            if not cands:
+                move(a, 1); continue
+            b = cands[int(rng.integers(len(cands)))]
+            move(b, 1)
+            tabu.append(a)
+            total += sum(t for _, t in fill(neighbours(a)))
+        if total > best_total:
+            best_total = total; best_x = list(x); stall = 0
+        else:
+            stall += 1
+
+    return [(k, t) for k, t in enumerate(best_x) if t > 0]
+
+
+def reproducible_run(seed, time_limit=None):
+    """시드가 있고 탐색 시간 제한이 없으면 (보정 단계 포함) 같은 입력에서 같은 결과를 돌려주는 실행"""
+    return seed is not None and time_limit is None
+
+
+def repair_limits(repair_time, n_classes, reproducible):
+    """
+    repair_takes 한도 인자
+    재현 실행이면 repair_time 을 클래스 수 기준 이동 수로 환산해 시계와 무관하게 멈추고,
+    아니면 repair_time 초 시간 한도를 그대로 씁니다.
+    """
+    if not reproducible:
+        return {'time_limit': repair_time}
+    return {'time_limit': None, 'max_moves': max(REPAIR_MIN_MOVES, int(repair_time * REPAIR_SCAN_RATE / max(n_classes, 1)))}
+
+
+# ==============================================================================
+# 4-1. 하드 / 소프트 쿼터 등급
+# ==============================================================================
+# 그룹 등급: 0 = 하드 (반드시 지킴), 1 이상 = 소프트 우선순위 (1 이 가장 중요)
+HARD_TIER = 0
+
+def tier_plan(cell_keys, group_tiers, cap):
+    """
+    그룹 등급 -> 셀 등급 계획
+    반환 dict: cell_tier (셀별 등급), levels (소프트 등급, 중요한 순), level_cells (등급별 셀),
+              relax (용량을 푸는 순서 = 덜 중요한 등급부터), soft_totals (등급별 목표 합)
+    """
+    cell_tier = [HARD_TIER if g is None else group_tiers[g] for g, _ in cell_keys]
+    levels = sorted({t for t in cell_tier if t != HARD_TIER})
+    level_cells = [[c for c, t in enumerate(cell_tier) if t == lv] for lv in levels]
+    return {
+        'cell_tier': cell_tier,
+        'levels': levels,
+        'level_cells': level_cells,
+        'relax': level_cells[::-1],
+        'soft_totals': [int(sum(int(cap[c]) for c in cells)) for cells in level_cells],
+    }
+
+def tier_objective(takes, members, cap_list, tiers):
+    """사전식 목적값: (하드 충족 = 매칭 수, 소프트 등급별 min(배정, 목표) 합 ...)"""
+    used = {}
+    total = 0
+    for k, t in takes:
+        total += t
+        for c, m in members[k]:
+            used[c] = used.get(c, 0) + m * t
+    return (total,) + tuple(sum(min(used.get(c, 0), cap_list[c]) for c in cells) for cells in tiers['level_cells'])
+
+def hard_caps(cap, tiers):
+    """소프트 셀 용량을 무제한으로 푼 용량 (하드 충족 최대화용 보정 단계)"""
+    out = np.array(cap, dtype=np.int64)
+    for cells in tiers['level_cells']:
+        out[cells] = np.iinfo(np.int64).max // 4
+    return out
+
+def with_total_cell(enc, total):
+    """
+    모든 응답자가 속하는 '전체 목표' 셀을 추가합니다.
+    메인 쿼터가 소프트여도 선택 인원이 전체 목표를 넘지 않도록 하는 하드 셀 (그룹 번호 None)
+    """
+    n = len(enc['indptr']) - 1
+    c = len(enc['cap'])
+    counts = np.diff(enc['indptr']) + 1
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    cells = np.full(indptr[-1], c, dtype=np.int32)
+    mask = np.ones(indptr[-1], dtype=bool)
+    mask[indptr[1:] - 1] = False
+    cells[mask] = enc['cells']
+    return {
+        'cap': np.append(enc['cap'], np.int64(total)),
+        'indptr': indptr,
+        'cells': cells,
+        'cell_keys': enc['cell_keys'] + [(None, 'Total')],
+    }
+
+
+# ==============================================================================
+# 5. 진행 상황 공유 저장소 (시간 제한 / 실시간 표시)
+# ==============================================================================
+# 워커별 슬롯 한 줄: [seq, 최고 매칭 수, 진행 반복 수, 선택 벡터...]
+# 각 워커는 자기 줄에만 쓰므로 잠금이 필요 없고, seq 가 홀수인 동안은 쓰는 중입니다.
+def make_progress_store(n_workers, sel_len, backend="threads"):
+    """스레드: 일반 배열 / 프로세스: /dev/shm memmap (joblib 이 같은 파일을 워커에 r+ 로 전달)"""
+    shape = (n_workers, 3 + sel_len)
+    if backend == "threads":
+        store = np.zeros(shape, dtype=np.int64)
+    else:
+        folder = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        fd, path = tempfile.mkstemp(prefix="quota_progress_", suffix=".mmap", dir=folder)
+        os.close(fd)
+        store = np.memmap(path, dtype=np.int64, mode="w+", shape=shape)
+    store[:, 1] = -1
+    return store
+
+def release_progress_store(store):
+    if isinstance(store, np.memmap):
+        path = store.filename
+        del store
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def publish_progress(store, worker_id, cnt, sel_vec):
+    row = store[worker_id]
+    row[0] += 1
+    row[3:] = sel_vec
+    row[1] = cnt
+    row[0] += 1
+
+def read_progress(store, with_selection=False):
+    """반환: (최고 매칭 수, 전체 진행 반복 수, 최고 선택 벡터 또는 None)"""
+    snap = np.array(store)
+    for _ in range(10):
+        seq_ok = (snap[:, 0] % 2 == 0).all()
+        again = np.array(store)
+        if seq_ok and (again[:, 0] == snap[:, 0]).all():
+            break
+        snap = again
+    w = int(np.argmax(snap[:, 1]))
+    sel = snap[w, 3:].copy() if with_selection and snap[w, 1] >= 0 else None
+    return int(snap[w, 1]), int(snap[:, 2].sum()), sel
+
+
+# ==============================================================================
+# 6. 병렬 실행 (스레드 / 프로세스)
+# ==============================================================================
+def run_simulations(iters, indices, scores, m_keys, ex_keys_list, main_map, ex_maps_list, target_threshold, n_workers=None, backend="threads", compress=True, repair=False, repair_time=10.0, time_limit=None, progress=None, poll_interval=0.5, seed=None, warm_positions=None, group_tiers=None, enc=None, cls=None):
+    """
+    전체 시도 횟수를 워커 수로 나누어 병렬 실행하고 최고 결과를 반환합니다.
+    backend: "threads" (GIL 공유) 또는 "processes" (코어별 독립 프로세스)
+    compress: True 이면 동치 클래스 단위로 배정한 뒤 마지막에만 응답자로 전개
+    repair: True 이면 최고 결과에 로컬 서치 보정(repair_takes)을 추가 적용
+    time_limit: 초 단위 제한 시간 (지정 시 iters 와 무관하게 시간이 다 될 때까지 탐색)
+    progress: progress(경과 초, 최고 매칭 수, 누적 반복 수) 콜백 - poll_interval 마다 호출
+    seed: 정수 시드. SeedSequence.spawn 으로 워커별 독립 Generator 를 만들며,
+          시도 횟수 기준 실행이면 같은 데이터/시드/워커 수에서 같은 선택 결과를 돌려줍니다.
+          (재현성을 위해 이때는 다른 워커의 목표 도달로 조기 종료하지 않고, 보정 단계도 repair_limits 의 이동 수 한도로 멈춤)
+    warm_positions: 이전 실행의 선택 위치. 새 목표에 맞게 초과분만 빼고 보정한 뒤,
+                    목표에 도달하면 시뮬레이션 없이 바로 반환하고 아니면 탐색 결과와 비교합니다.
+    group_tiers: 그룹별 등급 [메인, 추가 1, ...] (0 = 하드, 1 이상 = 소프트 우선순위).
+                 소프트 그룹이 있으면 같은 인코딩 위에서 (하드 충족, 소프트 등급별 충족) 을 사전식으로 최대화합니다.
+                 (클래스 단위 전용, 웜 스타트 미적용)
+    enc / cls: 같은 키 구성으로 미리 만든 encode_quota / compress_classes 결과 (with_caps / reorder_classes 로
+               이번 목표와 점수를 반영한 것). 주어지면 인코딩/압축을 생략합니다. (등급 실행에서는 cls 를 다시 만듦)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 backend: {backend}")
+    n_workers = n_workers or cpu_count()
+    ipc = max(1, iters // n_workers) if time_limit is None else sys.maxsize
+    t0 = time.time()
+    deadline = None if time_limit is None else t0 + time_limit
+
+    # 키 인코딩/클래스 압축은 워커 수와 무관하게 한 번만 수행
+    if enc is None:
+        enc = encode_quota(m_keys, ex_keys_list, main_map, ex_maps_list)
+    scores = np.asarray(scores, dtype=np.float64)
+    tiers = None
+    if group_tiers is not None and any(t != HARD_TIER for t in group_tiers):
+        main_total = sum(int(enc['cap'][c]) for c, (g, _) in enumerate(enc['cell_keys']) if g == 0)
+        enc = with_total_cell(enc, main_total)
+        tiers = tier_plan(enc['cell_keys'], group_tiers, enc['cap'])
+        compress, warm_positions, cls = True, None, None
+    if cls is None and (compress or repair or warm_positions is not None):
+        cls = compress_classes(enc['indptr'], enc['cells'], scores)
+    if compress:
+        worker = class_worker
+        args = (cls['class_scores'], enc['cap'], cls['class_indptr'], cls['class_cells'], cls['class_counts'], target_threshold)
+        sel_len = len(cls['class_counts'])
+    else:
+        worker = encoded_worker
+        args = (scores, enc['cap'], enc['indptr'], enc['cells'], target_threshold)
+        sel_len = len(scores)
+    # 워커별 독립 난수 스트림 (+ 보정 단계용 1개)
+    streams = np.random.SeedSequence(seed).spawn(n_workers + 1)
+    rngs = [np.random.default_rng(ss) for ss in streams[:n_workers]]
+    # 등급 실행은 하드 목표 도달 후에도 소프트 충족을 더 올릴 수 있으므로 다른 워커 기록으로 멈추지 않음
+    stop_on_shared = not reproducible_run(seed, time_limit) and tiers is None
+    repair_kw = repair_limits(repair_time, 0 if cls is None else len(cls['class_counts']), reproducible_run(seed, time_limit))
+    wkw = {'tiers': tiers} if tiers is not None else {}
+
+    warm_takes = None
+    if warm_positions is not None:
+        # 웜 스타트: 바뀐 목표의 영향을 받는 셀만 조정하고 빈 용량은 보정 단계에서 채움
+        prefer = set(warm_positions)
+        warm_takes = fit_takes(enc['cap'], cls['class_indptr'], cls['class_cells'],
+                               takes_from_positions(warm_positions, cls['row_class']), cls['class_scores'])
+        warm_takes = repair_takes(enc['cap'], cls['class_indptr'], cls['class_cells'], cls['class_counts'], warm_takes,
+                                  target=target_threshold, seed=streams[-1], **repair_kw)
+        warm_cnt = sum(t for _, t in warm_takes)
+        if warm_cnt >= target_threshold:
+            return warm_cnt, [indices[p] for p in expand_classes(warm_takes, cls['class_start'], cls['class_rows'], prefer)]
+    use_store = progress is not None or deadline is not None
+    store = make_progress_store(n_workers, sel_len, backend) if use_store else None
+
+    def launch():
+        if backend == "threads":
+            return Parallel(n_jobs=n_workers, backend=BACKENDS[backend])(
+                delayed(worker)(i, ipc, *args, deadline=deadline, store=store, rng=rngs[i], stop_on_shared=stop_on_shared, **wkw)
+                for i in range(n_workers))
+        # 배열은 한 번만 덤프하고 모든 워커가 memmap 으로 공유 (max_nbytes=0)
+        return Parallel(n_jobs=n_workers, backend=BACKENDS[backend], max_nbytes=0, mmap_mode="r")(
+            delayed(_process_worker)(worker, i, ipc, *args, deadline=deadline, store=store, rng=rngs[i], stop_on_shared=stop_on_shared, **wkw)
+            for i in range(n_workers))
+
+    try:
+        if progress is None:
+            res = launch()
+        else:
+            # 워커는 백그라운드 스레드에서 돌리고, 호출 스레드는 저장소를 주기적으로 읽어 콜백에 전달
+            box = {}
+            def target():
+                try:
+                    box['res'] = launch()
+                except BaseException as e:
+                    box['err'] = e
+            th = threading.Thread(target=target, daemon=True)
+            th.start()
+            while th.is_alive():
+                th.join(poll_interval)
+                best_cnt, done, _ = read_progress(store)
+                progress(time.time() - t0, max(best_cnt, 0), done)
+            if 'err' in box:
+                raise box['err']
+            res = box['res']
+    finally:
+        if store is not None:
+            release_progress_store(store)
+
+    if tiers is not None:
+        return _finish_tiered(res, enc, cls, tiers, indices, target_threshold, repair, repair_kw, streams[-1])
+
+    g_best_cnt = 0; g_best = []
+    for c, best in res:
+        if c > g_best_cnt: g_best_cnt = c; g_best = best
+    if repair and g_best_cnt < target_threshold:
+        takes = g_best if compress else takes_from_positions(g_best, cls['row_class'])
+        takes = repair_takes(enc['cap'], cls['class_indptr'], cls['class_cells'], cls['class_counts'], takes, target=target_threshold, seed=streams[-1], **repair_kw)
+        g_best_cnt = sum(t for _, t in takes)
+        g_best_pos = expand_classes(takes, cls['class_start'], cls['class_rows'])
+    else:
+        g_best_pos = expand_classes(g_best, cls['class_start'], cls['class_rows']) if compress else g_best
+    if warm_takes is not None and warm_cnt > g_best_cnt:
+        g_best_cnt = warm_cnt
+        g_best_pos = expand_classes(warm_takes, cls['class_start'], cls['class_rows'], prefer)
+    # 위치 -> 원본 라벨 인덱스
+    return g_best_cnt, [indices[p] for p in g_best_pos]
+
+def _finish_tiered(res, enc, cls, tiers, indices, target_threshold, repair, repair_kw, seed):
+    """
+    등급 실행 마무리: 워커 결과를 사전식으로 비교하고, 하드 목표 미달이면 소프트 제한을 푼 보정 결과와 비교
+    보정은 등급 그리디 최고 결과와, 모든 셀을 지킨 첫 단계 최고 결과(전체 하드 실행의 그리디 결과)를
+    전체 하드 용량으로 보정한 결과 두 곳에서 시작하므로 하드 충족이 전체 하드 실행보다 줄지 않습니다.
+    repair_kw: repair_limits 결과 (재현 실행이면 세 번의 보정 모두 이동 수 한도로 멈춤)
+    """
+    members = class_members(cls['class_indptr'], cls['class_cells'])
+    cap_list = np.asarray(enc['cap']).tolist()
+    score = lambda takes: tier_objective(takes, members, cap_list, tiers)
+    g_best = max((best for _, best, _ in res), key=score)
+    if repair and score(g_best)[0] < target_threshold:
+        common = (cls['class_indptr'], cls['class_cells'], cls['class_counts'])
+        relaxed = hard_caps(enc['cap'], tiers)
+        strict = max((s for _, _, s in res), key=lambda takes: sum(t for _, t in takes))
+        strict = repair_takes(enc['cap'], *common, strict, target=target_threshold, seed=seed, **repair_kw)
+        for start in (g_best, strict):
+            fixed = repair_takes(relaxed, *common, start, target=target_threshold, seed=seed, **repair_kw)
+            if score(fixed) > score(g_best):
+                g_best = fixed
+    pos = expand_classes(g_best, cls['class_start'], cls['class_rows'])
+    return len(pos), [indices[p] for p in pos]
+
+
+# ==============================================================================
+# 7. 시나리오 일괄 실행 (인코딩/클래스 공유)
+# ==============================================================================
+def encode_scenarios(m_keys, ex_keys_list, main_maps, ex_maps_lists):
+    """
+    여러 시나리오 목표의 키 합집합으로 한 번만 인코딩하고 시나리오별 용량 벡터를 만듭니다.
+    메인 쿼터: 시나리오에 없는 키는 용량 0 (단일 실행의 차단 셀과 같은 효과)
+    추가 쿼터: 시나리오에 없는 키는 제약이 없으므로 용량 무제한 (전체 소속 수 + 1)
+    반환: (enc, caps [시나리오 x 셀], active [시나리오 x 셀] 목표가 있는 셀 여부)
+    """
+    union_main = {}
+    for q_map in main_maps:
+        union_main.update(dict.fromkeys(q_map, 0))
+    union_ex = [{} for _ in ex_keys_list]
+    for ex_maps in ex_maps_lists:
+        for j, q_map in enumerate(ex_maps):
+            union_ex[j].update(dict.fromkeys(q_map, 0))
+    enc = encode_quota(m_keys, ex_keys_list, union_main, union_ex)
+
+    unlimited = len(enc['cells']) + 1
+    caps = np.zeros((len(main_maps), len(enc['cap'])), dtype=np.int64)
+    active = np.zeros(caps.shape, dtype=bool)
+    for s, (main_map, ex_maps) in enumerate(zip(main_maps, ex_maps_lists)):
+        q_maps = [main_map] + list(ex_maps)
+        for c, (g, k) in enumerate(enc['cell_keys']):
+            if g is None:
+                continue
+            if k in q_maps[g]:
+                caps[s, c] = _to_cap(q_maps[g][k])
+                active[s, c] = True
+            elif g > 0:
+                caps[s, c] = unlimited
+    return enc, caps, active
+
+def run_scenarios(iters, indices, scores_list, enc, caps, thresholds, n_workers=None, backend="threads", repair=False, repair_time=10.0, seed=None, cls=None):
+    """
+    encode_scenarios 결과로 여러 시나리오를 한 번의 워커 풀에서 실행합니다.
+    (시나리오 x 워커) 작업을 한꺼번에 넘기므로 먼저 끝난 시나리오의 코어를 다음 작업이 바로 씁니다.
+    시나리오마다 SeedSequence 를 따로 spawn 하므로 같은 시드면 시나리오 수와 무관하게 각 결과가 재현됩니다.
+    (시드가 있으면 보정 단계도 repair_limits 의 이동 수 한도로 멈춤)
+    cls: compress_classes 결과 (사전 진단 등에서 이미 만들었으면 재사용)
+    반환: [(매칭 수, 라벨 리스트)] (시나리오 순서)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 backend: {backend}")
+    n_workers = n_workers or cpu_count()
+    ipc = max(1, iters // n_workers)
+    n_sc = len(scores_list)
+
+    if cls is None:
+        cls = compress_classes(enc['indptr'], enc['cells'], scores_list[0])
+    orders = [class_order(cls['row_class'], cls['class_counts'], sc) for sc in scores_list]
+    streams = [ss.spawn(n_workers + 1) for ss in np.random.SeedSequence(seed).spawn(n_sc)]
+    common = (cls['class_indptr'], cls['class_cells'], cls['class_counts'])
+    repair_kw = repair_limits(repair_time, len(cls['class_counts']), reproducible_run(seed))
+    tasks = [(s, i) for s in range(n_sc) for i in range(n_workers)]
+
+    if backend == "threads":
+        res = Parallel(n_jobs=n_workers, backend=BACKENDS[backend])(
+            delayed(class_worker)(i, ipc, orders[s][0], caps[s], *common, thresholds[s],
+                                  rng=np.random.default_rng(streams[s][i]), stop_on_shared=False)
+            for s, i in tasks)
+    else:
+        res = Parallel(n_jobs=n_workers, backend=BACKENDS[backend], max_nbytes=0, mmap_mode="r")(
+            delayed(_process_worker)(class_worker, i, ipc, orders[s][0], caps[s], *common, thresholds[s],
+                                     rng=np.random.default_rng(streams[s][i]), stop_on_shared=False)
+            for s, i in tasks)
+
+    best = [(0, []) for _ in range(n_sc)]
+    for (s, _), (c, takes) in zip(tasks, res):
+        if c > best[s][0]: best[s] = (c, takes)
+
+    out = []
+    for s, (cnt, takes) in enumerate(best):
+        if repair and cnt < thresholds[s]:
+            takes = repair_takes(caps[s], *common, takes, target=thresholds[s], seed=streams[s][-1], **repair_kw)
+            cnt = sum(t for _, t in takes)
+        pos = expand_classes(takes, cls['class_start'], orders[s][1])
+        out.append((cnt, [indices[p] for p in pos]))
+    return out
@@ -0,0 +1,528 @@
+"""
+쿼터 정확해 솔버 (Streamlit 비의존 모듈)
+
+랜덤 그리디(quota_engine)와 같은 셀 인코딩/동치 클래스를 사용합니다.
+- 메인 쿼터 + 추가 그룹 1개(1인 1셀): 최대유량 (Dinic, 순수 Python)
+- 그 외: LP 완화(유계 심플렉스, NumPy) 기반 분기한정법
+"""
+import time
+import collections
+import numpy as np
+
+import quota_engine
+
+EPS = 1e-9
+
+
+# ==============================================================================
+# 1. 클래스 x 셀 행렬
+# ==============================================================================
+def class_matrix(cap, class_indptr, class_cells, class_counts):
+    """
+    정수계획 형태로 변환: max sum(x)  s.t.  A x <= cap, 0 <= x <= counts
+    용량 0 셀에 소속된 클래스와 어떤 경우에도 넘치지 않는 셀(제약 무의미)은 미리 제거합니다.
+    A 는 소속 횟수(m) 그대로의 엄격 기준 - 복수응답 열에 같은 키가 m 번 있으면 m 명분을 차감하므로
+    목표를 넘기지 않습니다. 그리디는 잔여가 1 이상이면 받아(ceil(r/m)) 최대 m-1 만큼 넘길 수 있어
+    같은 키가 겹치는 응답자가 있으면 이 모델의 최적값이 그리디보다 작을 수 있습니다 (solve_exact 참고).
+    반환: (A, b, u, live_classes, live_cells)
+    """
+    cap = np.asarray(cap, dtype=np.int64)
+    counts = np.asarray(class_counts, dtype=np.int64)
+    members = quota_engine.class_members(class_indptr, class_cells)
+
+    live = [k for k, mem in enumerate(members) if counts[k] > 0 and all(cap[c] > 0 for c, _ in mem)]
+    demand = np.zeros(len(cap), dtype=np.int64)
+    for k in live:
+        for c, m in members[k]:
+            demand[c] += m * counts[k]
+    live_cells = np.flatnonzero(demand > cap)
+    row_of = {c: r for r, c in enumerate(live_cells.tolist())}
+
+    A = np.zeros((len(live_cells), len(live)), dtype=np.float64)
+    for col, k in enumerate(live):
+        for c, m in members[k]:
+            r = row_of.get(c)
+            if r is not None:
+                A[r, col] += m
+    return A, cap[live_cells].astype(np.float64), counts[live].astype(np.float64), np.asarray(live, dtype=np.int64), live_cells
+
+
+# ==============================================================================
+# 2. LP 완화: 유계 변수 primal 심플렉스 (A >= 0, b >= 0 이므로 x=0 에서 바로 시작)
+# ==============================================================================
+def solve_lp(A, b, c, u, max_iter=20000, duals=False):
+    """
+    max c.x  s.t.  A x <= b, 0 <= x <= u  ->  (x, 목적값)
+    duals=True 이면 (x, 목적값, y) - y 는 제약(행)별 쌍대가격 (b 를 1 늘릴 때 목적값 증가분, 최종 표의 여유변수 축소비용)
+    """
+    m, n = A.shape
+    if n == 0:
+        return (np.zeros(0), 0.0, np.zeros(m)) if duals else (np.zeros(0), 0.0)
+    N = n + m
+    T = np.hstack([A, np.eye(m)])
+    ub = np.concatenate([np.asarray(u, dtype=np.float64), np.full(m, np.inf)])
+    d = np.concatenate([np.asarray(c, dtype=np.float64), np.zeros(m)])
+    basis = np.arange(n, N)
+    xB = np.asarray(b, dtype=np.float64).copy()
+    at_upper = np.zeros(N, dtype=bool)
+    is_basic = np.zeros(N, dtype=bool); is_basic[basis] = True
+    obj = 0.0
+    degenerate = 0
+
+    for _ in range(max_iter):
+        rate = np.where(at_upper, -d, d)
+        rate[is_basic] = 0.0
+        if degenerate > 50:
+            # 순환 방지: Bland 규칙 (개선 가능한 가장 작은 인덱스)
+            cand = np.flatnonzero(rate > EPS)
+            if len(cand) == 0: break
+            j = int(cand[0])
+        else:
+            j = int(np.argmax(rate))
+            if rate[j] <= EPS: break
+        delta = -1.0 if at_upper[j] else 1.0
+        col = T[:, j] * delta
+
+        # 비율 검정: 기저변수가 하한(0) 또는 상한에 닿는 최소 이동량
+        theta = ub[j]
+        r = -1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dec = np.where(col > EPS, xB / col, np.inf)
+            inc = np.where(col < -EPS, (ub[basis] - xB) / -col, np.inf)
+        lim = np.minimum(dec, inc)
+        if len(lim):
+            r_min = int(np.argmin(lim))
+            if lim[r_min] < theta:
+                theta = lim[r_min]; r = r_min
+        if not np.isfinite(theta):
+            raise ValueError("LP가 유계가 아닙니다.")
+        theta = max(theta, 0.0)
+        degenerate = degenerate + 1 if theta <= EPS else 0
+
+        xB -= theta * col
+        obj += theta * rate[j]
+        if r < 0:
+            # 진입 변수가 반대쪽 한계로 이동 (기저 변경 없음)
+            at_upper[j] = not at_upper[j]
+            continue
+
+        leaving = basis[r]
+        enter_val = (ub[j] if at_upper[j] else 0.0) + delta * theta
+        at_upper[leaving] = col[r] < 0
+        is_basic[leaving] = False
+        at_upper[j] = False
+        is_basic[j] = True
+        basis[r] = j
+        xB[r] = enter_val
+
+        piv = T[r] / T[r, j]
+        T -= np.outer(T[:, j], piv)
+        T[r] = piv
+        d -= d[j] * piv
+
+    x = np.where(at_upper, ub, 0.0)
+    x[basis] = xB
+    x = np.clip(x[:n], 0.0, np.asarray(u, dtype=np.float64))
+    if duals:
+        return x, obj, np.maximum(-d[n:], 0.0)
+    return x, obj
+
+
+# ==============================================================================
+# 3. 분기한정법 (LP 상한 + 내림/그리디 하한)
+# ==============================================================================
+def _round_and_fill(A, b, u, x):
+    """LP 해를 내림한 뒤 잔여 용량으로 소수부가 큰 클래스부터 채우는 정수 가능해"""
+    xi = np.floor(x + 1e-7)
+    res = b - A @ xi
+    for k in np.argsort(-(x - xi), kind='stable'):
+        room = u[k] - xi[k]
+        if room <= 0: continue
+        col = A[:, k]
+        nz = col > 0
+        if nz.any():
+            room = min(room, np.floor((res[nz] + 1e-7) / col[nz]).min())
+        if room > 0:
+            xi[k] += room
+            res -= room * col
+    return xi
+
+def branch_and_bound(A, b, u, time_limit=30.0, node_limit=5000, incumbent=None):
+    """
+    정수해 탐색. 반환: (x, 최적값, 상한, 최적증명여부)
+    시간/노드 한도에 걸리면 남은 노드의 LP 상한 중 최대값을 상한으로 보고합니다.
+    """
+    m, n = A.shape
+    if n == 0:
+        # 선택 가능한 클래스 없음 (메인 쿼터 밖 응답자뿐이거나 목표가 모두 0)
+        return np.zeros(0), 0, 0, True
+    if m == 0:
+        # 넘칠 수 있는 셀이 없으면 모든 클래스를 전부 선택하는 것이 최적
+        u = np.asarray(u, dtype=np.float64)
+        return u.copy(), int(u.sum()), int(u.sum()), True
+    deadline = time.time() + time_limit
+    best_x = np.zeros(n) if incumbent is None else np.asarray(incumbent, dtype=np.float64)
+    best_val = float(best_x.sum())
+    stack = [(np.zeros(n), np.asarray(u, dtype=np.float64).copy(), np.inf)]
+    nodes = 0
+    root_bound = None
+
+    while stack:
+        if nodes >= node_limit or time.time() > deadline:
+            break
+        lo, hi, parent_bound = stack.pop()
+        if parent_bound <= best_val:
+            continue
+        nodes += 1
+        rhs = b - A @ lo
+        if (rhs < -EPS).any():
+            continue
+        xp, z = solve_lp(A, rhs, np.ones(n), hi - lo)
+        x = lo + xp
+        bound = np.floor(z + lo.sum() + 1e-6)
+        if root_bound is None:
+            root_bound = bound
+        if bound <= best_val:
+            continue
+
+        cand = lo + _round_and_fill(A, rhs, hi - lo, xp)
+        if cand.sum() > best_val:
+            best_val = float(cand.sum()); best_x = cand
+            if best_val >= bound:
+                continue
+
+        frac = x - np.floor(x + 1e-7)
+        frac[frac < 1e-6] = 0
+        if not frac.any():
+            continue
+        k = int(np.argmax(np.minimum(frac, 1 - frac)))
+        down_hi = hi.copy(); down_hi[k] = np.floor(x[k])
+        up_lo = lo.copy(); up_lo[k] = np.floor(x[k]) + 1
+        stack.append((lo, down_hi, bound))
+        stack.append((up_lo, hi, bound))
+
+    open_bounds = [nb for _, _, nb in stack if nb > best_val]
+    open_bound = min(max(open_bounds), root_bound if root_bound is not None else np.inf) if open_bounds else best_val
+    return best_x, int(best_val), int(max(best_val, open_bound)), not open_bounds
+
+
+# ==============================================================================
+# 4. 최대유량 (메인 + 추가 그룹 1개)
+# ==============================================================================
+def max_flow(n_nodes, edges, s, t):
+    """
+    edges: [(u, v, 용량, 비용)] -> 간선별 유량 리스트 (비용 무시)
+    Dinic: BFS 레벨 그래프 + 반복형 DFS 블로킹 플로우.
+    """
+    head = [[] for _ in range(n_nodes)]
+    to, cap = [], []
+    for u_, v_, c_, _ in edges:
+        head[u_].append(len(to)); to.append(v_); cap.append(c_)
+        head[v_].append(len(to)); to.append(u_); cap.append(0)
+
+    while True:
+        level = [-1] * n_nodes
+        level[s] = 0
+        queue = [s]
+        for x in queue:
+            for e in head[x]:
+                if cap[e] > 0 and level[to[e]] < 0:
+                    level[to[e]] = level[x] + 1
+                    queue.append(to[e])
+        if level[t] < 0:
+            break
+        it = [0] * n_nodes
+        while True:
+            # s 에서 t 까지 레벨이 1씩 증가하는 경로 탐색
+            path = []
+            v = s
+            while v != t:
+                adv = False
+                while it[v] < len(head[v]):
+                    e = head[v][it[v]]
+                    if cap[e] > 0 and level[to[e]] == level[v] + 1:
+                        path.append(e); v = to[e]; adv = True
+                        break
+                    it[v] += 1
+                if not adv:
+                    if v == s:
+                        break
+                    level[v] = -1
+                    e = path.pop(); v = to[e ^ 1]; it[v] += 1
+            if v != t:
+                break
+            push = min(cap[e] for e in path)
+            for e in path:
+                cap[e] -= push; cap[e ^ 1] += push
+
+    return [cap[2 * i + 1] for i in range(len(edges))]
+
+def flow_applicable(cell_groups, class_indptr, class_cells):
+    """
+    모든 클래스가 메인 셀 1개 + (단일) 추가 그룹의 셀 최대 1개에만 소속되면 유량 모델로 풀 수 있음
+    차단 셀(0, 그룹 None)은 용량 0 이라 유량이 흐르지 않으므로 그룹으로 세지 않습니다.
+    """
+    extra_groups = set()
+    for mem in quota_engine.row_members(class_indptr, class_cells):
+        ex = [c for c in mem if cell_groups[c] not in (0, None)]
+        if len(ex) > 1:
+            return False
+        extra_groups.update(cell_groups[c] for c in ex)
+    return len(extra_groups) <= 1
+
+def solve_flow(cap, cell_groups, class_indptr, class_cells, class_counts):
+    """메인 셀 -> (클래스) -> 추가 셀 유량 모델. 반환: 클래스별 배정 인원 배열"""
+    n_cells = len(cap)
+    S, T = n_cells, n_cells + 1
+    edges = []
+    for c in range(n_cells):
+        if cap[c] <= 0: continue
+        if cell_groups[c] == 0: edges.append((S, c, int(cap[c]), 0))
+        else: edges.append((c, T, int(cap[c]), 0))
+    n_fixed = len(edges)
+    cls_edges = []
+    for k, mem in enumerate(quota_engine.row_members(class_indptr, class_cells)):
+        main = [c for c in mem if cell_groups[c] == 0]
+        ex = [c for c in mem if cell_groups[c] not in (0, None)]
+        if class_counts[k] <= 0 or not main or cap[main[0]] <= 0: continue
+        edges.append((main[0], ex[0] if ex else T, int(class_counts[k]), 0))
+        cls_edges.append(k)
+    flows = max_flow(n_cells + 2, edges, S, T)
+    takes = np.zeros(len(class_counts), dtype=np.int64)
+    for k, f in zip(cls_edges, flows[n_fixed:]):
+        takes[k] = f
+    return takes
+
+
+# ==============================================================================
+# 5. 사전 진단 (셀별 가용 인원 / 유량 완화 상한)
+# ==============================================================================
+def cell_availability(cap, class_indptr, class_cells, class_counts):
+    """셀별 선택 가능 응답자 수 (용량 0 셀 - 메인 쿼터에 없는 키 포함 - 에 속하지 않는 응답자만)"""
+    avail = np.zeros(len(cap), dtype=np.int64)
+    for k, mem in enumerate(quota_engine.class_members(class_indptr, class_cells)):
+        if any(cap[c] <= 0 for c, _ in mem):
+            continue
+        for c, _ in mem:
+            avail[c] += class_counts[k]
+    return avail
+
+def group_flow_bound(cap, cell_groups, class_indptr, class_cells, class_counts, group):
+    """
+    메인 쿼터 + 추가 그룹 하나만 남긴 완화 문제의 최대유량 (전체 문제의 상한).
+    한 사람이 그룹 안의 여러 셀에 속하면 '그중 한 셀만 차감' 으로 더 완화합니다.
+    group=0 이면 메인 쿼터만 고려합니다.
+    """
+    agg = {}
+    for k, mem in enumerate(quota_engine.row_members(class_indptr, class_cells)):
+        if class_counts[k] <= 0 or any(cap[c] <= 0 for c in mem):
+            continue
+        main = [c for c in mem if cell_groups[c] == 0][0]
+        js = tuple(sorted({c for c in mem if group and cell_groups[c] == group}))
+        agg[(main, js)] = agg.get((main, js), 0) + int(class_counts[k])
+
+    n_cells = len(cap)
+    S, T = n_cells, n_cells + 1
+    n_nodes = n_cells + 2
+    edges = []
+    for c in range(n_cells):
+        if cap[c] <= 0: continue
+        if cell_groups[c] == 0: edges.append((S, c, int(cap[c]), 0))
+        elif cell_groups[c] == group: edges.append((c, T, int(cap[c]), 0))
+    for (main, js), cnt in agg.items():
+        if len(js) <= 1:
+            edges.append((main, js[0] if js else T, cnt, 0))
+        else:
+            p = n_nodes; n_nodes += 1
+            edges.append((main, p, cnt, 0))
+            edges.extend((p, j, cnt, 0) for j in js)
+    flows = max_flow(n_nodes, edges, S, T)
+    return int(sum(f for (u_, _, _, _), f in zip(edges, flows) if u_ == S))
+
+def feasibility_report(enc, cls):
+    """
+    시뮬레이션 전 빠른 진단.
+    반환 dict: bound(달성 가능 상한), group_bounds(그룹별 완화 상한), short_cells(가용 인원 < 목표인 셀 목록)
+    enc 에 'active' (셀별 목표 여부) 가 있으면 목표가 있는 셀만 부족 셀로 보고합니다 (시나리오 공유 인코딩).
+    """
+    cap = enc['cap']
+    active = enc.get('active')
+    cell_groups = [g for g, _ in enc['cell_keys']]
+    avail = cell_availability(cap, cls['class_indptr'], cls['class_cells'], cls['class_counts'])
+    short_cells = [
+        {'group': g, 'key': k, 'target': int(cap[c]), 'available': int(avail[c])}
+        for c, (g, k) in enumerate(enc['cell_keys'])
+        if g is not None and (active is None or active[c]) and avail[c] < cap[c]
+    ]
+    groups = sorted({g for g in cell_groups if g})
+    group_bounds = {g: group_flow_bound(cap, cell_groups, cls['class_indptr'], cls['class_cells'], cls['class_counts'], g)
+                    for g in [0] + groups}
+    return {'bound': min(group_bounds.values()), 'group_bounds': group_bounds, 'short_cells': short_cells}
+
+def precheck(scores, m_keys, ex_keys_list, main_map, ex_maps_list, group_tiers=None, enc=None, cls=None):
+    """
+    키/목표만으로 feasibility_report 계산 (인코딩 포함)
+    group_tiers: 그룹별 등급 (0 = 하드). 소프트 그룹은 진단에서 제외하고, 메인 쿼터가 소프트면 상한은 전체 목표
+    enc / cls: 미리 만든 인코딩 / 클래스 압축 (소프트 그룹이 있으면 추가 쿼터 구성이 달라지므로 무시)
+    """
+    soft_main = group_tiers is not None and group_tiers[0] != quota_engine.HARD_TIER
+    if group_tiers is not None and any(t != quota_engine.HARD_TIER for t in group_tiers):
+        ex_maps_list = [m if t == quota_engine.HARD_TIER else {} for m, t in zip(ex_maps_list, group_tiers[1:])]
+        enc = cls = None
+    if enc is None:
+        enc = quota_engine.encode_quota(m_keys, ex_keys_list, main_map, ex_maps_list)
+        cls = None
+    if cls is None:
+        cls = quota_engine.compress_classes(enc['indptr'], enc['cells'], scores)
+    rep = feasibility_report(enc, cls)
+    if soft_main:
+        total = int(sum(enc['cap'][c] for c, (g, _) in enumerate(enc['cell_keys']) if g == 0))
+        rep = {**rep, 'bound': total, 'short_cells': [c for c in rep['short_cells'] if c['group'] != 0]}
+    return rep
+
+
+# ==============================================================================
+# 6. 통합 진입점
+# ==============================================================================
+def solve_exact(indices, scores, m_keys, ex_keys_list, main_map, ex_maps_list, time_limit=30.0, node_limit=5000, enc=None, cls=None):
+    """
+    정확해 모드. 반환: (매칭 수, 라벨 인덱스 리스트, info)
+    info = {'method': 'flow' | 'bnb', 'bound': 상한, 'optimal': 최적 증명 여부, 'dup_keys': 중복 키 여부}
+    같은 키가 한 응답자에게 겹치면(dup_keys) 해는 엄격 기준(class_matrix)으로 구하고, 상한은 그리디 기준
+    (셀별 최대 중복 횟수 - 1 만큼 넘침 허용)의 LP 완화로 보고합니다. 해가 그 상한에 닿아야만 최적입니다.
+    enc / cls: 미리 만든 인코딩 / 클래스 압축 (run_simulations 와 같음)
+    """
+    if enc is None:
+        enc = quota_engine.encode_quota(m_keys, ex_keys_list, main_map, ex_maps_list)
+        cls = None
+    if cls is None:
+        cls = quota_engine.compress_classes(enc['indptr'], enc['cells'], scores)
+    cell_groups = [g for g, _ in enc['cell_keys']]
+
+    if flow_applicable(cell_groups, cls['class_indptr'], cls['class_cells']):
+        takes = solve_flow(enc['cap'], cell_groups, cls['class_indptr'], cls['class_cells'], cls['class_counts'])
+        best = int(takes.sum())
+        info = {'method': 'flow', 'bound': best, 'optimal': True, 'dup_keys': False}
+    else:
+        A, b, u, live, _ = class_matrix(enc['cap'], cls['class_indptr'], cls['class_cells'], cls['class_counts'])
+        x, best, upper, proven = branch_and_bound(A, b, u, time_limit=time_limit, node_limit=node_limit)
+        takes = np.zeros(len(cls['class_counts']), dtype=np.int64)
+        takes[live] = np.round(x).astype(np.int64)
+        # 셀별 최대 중복 횟수 - 1: 그리디가 이 셀을 넘길 수 있는 최대 인원
+        dup = A.max(axis=1, initial=0) - 1
+        if dup.any():
+            _, z = solve_lp(A, b + dup, np.ones(len(u)), u)
+            upper = max(best, int(np.floor(z + 1e-6)))
+            proven = proven and best >= upper
+        info = {'method': 'bnb', 'bound': upper, 'optimal': proven, 'dup_keys': bool(dup.any())}
+
+    pairs = [(k, int(t)) for k, t in enumerate(takes.tolist()) if t > 0]
+    pos = quota_engine.expand_classes(pairs, cls['class_start'], cls['class_rows'])
+    return len(pos), [indices[p] for p in pos], info
+
+
+# ==============================================================================
+# 7. 병목 진단 (LP 쌍대가격)
+# ==============================================================================
+def _joint_groups(binding, members, takes):
+    """선택된 클래스가 함께 걸친 묶인 셀끼리 한 묶음 (union-find). 반환: 셀 -> 묶음 번호 (1부터)"""
+    parent = {c: c for c in binding}
+    def find(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]; c = parent[c]
+        return c
+    for k, mem in enumerate(members):
+        if takes[k] <= 0: continue
+        cs = [c for c, _ in mem if c in parent]
+        for c in cs[1:]:
+            parent[find(c)] = find(cs[0])
+    roots = {}
+    return {c: roots.setdefault(find(c), len(roots) + 1) for c in sorted(binding)}
+
+def bottleneck_report(m_keys, ex_keys_list, main_map, ex_maps_list, group_tiers=None, top=5, tol=1e-6, enc=None, cls=None):
+    """
+    '경합 부족' 설명: 전체 문제의 LP 완화를 풀어 셀별 쌍대가격(목표 +1 당 늘어나는 달성 수)을 구합니다.
+    group_tiers 가 있으면 precheck 와 같이 소프트 추가 그룹은 제외합니다.
+    enc / cls: 미리 만든 인코딩 / 클래스 압축 (소프트 그룹이 있으면 추가 쿼터 구성이 달라지므로 무시)
+    반환 dict:
+      lp_bound   : LP 완화 상한
+      binding    : [{'group', 'key', 'target', 'price', 'joint'}]  꽉 찬 셀 중 쌍대가격 > 0 (joint = 함께 묶인 셀 묶음 번호)
+      rivals     : [{'group', 'key', 'shortage', 'rival_group', 'rival_key', 'contested', 'price'}]
+                   부족 셀의 미선택 후보 중 꽉 찬 다른 셀에도 속해 막힌 인원
+      recruit    : [{'group', 'key', 'profile', 'gain', 'room', 'unlock'}]
+                   부족 셀에 속하는 응답자 유형(셀 조합)별 1명 추가 시 늘어나는 달성 수(gain)와
+                   그 효과가 유지되는 인원(room), 기대 추가 달성 수(unlock)
+    """
+    if group_tiers is not None and any(t != quota_engine.HARD_TIER for t in group_tiers):
+        ex_maps_list = [m if t == quota_engine.HARD_TIER else {} for m, t in zip(ex_maps_list, group_tiers[1:])]
+        enc = cls = None
+    if enc is None:
+        enc = quota_engine.encode_quota(m_keys, ex_keys_list, main_map, ex_maps_list)
+        cls = None
+    if cls is None:
+        cls = quota_engine.compress_classes(enc['indptr'], enc['cells'], np.zeros(len(m_keys)))
+    cap = enc['cap']
+    counts = np.asarray(cls['class_counts'], dtype=np.int64)
+    members = quota_engine.class_members(cls['class_indptr'], cls['class_cells'])
+
+    A, b, u, live, live_cells = class_matrix(cap, cls['class_indptr'], cls['class_cells'], counts)
+    takes = np.zeros(len(counts))
+    price = np.zeros(len(cap))
+    if len(live):
+        if len(live_cells):
+            x, _, y = solve_lp(A, b, np.ones(len(live)), u, duals=True)
+            price[live_cells] = y
+        else:
+            x = u
+        takes[live] = x
+    used = np.zeros(len(cap))
+    for k, mem in enumerate(members):
+        for c, m in mem:
+            used[c] += m * takes[k]
+    slack = cap - used
+    full = slack <= 0.5
+    is_live = np.zeros(len(counts), dtype=bool); is_live[live] = True
+
+    binding = [c for c in range(1, len(cap)) if price[c] > tol]
+    joint = _joint_groups(binding, members, takes)
+    rep_binding = [{'group': enc['cell_keys'][c][0], 'key': enc['cell_keys'][c][1], 'target': int(cap[c]),
+                    'price': round(float(price[c]), 4), 'joint': joint[c]} for c in binding]
+
+    # 부족 셀별 후보 클래스 (차단된 클래스 제외)
+    short = [c for c in range(1, len(cap)) if cap[c] > 0 and slack[c] > 0.5]
+    cand = {c: [] for c in short}
+    for k, mem in enumerate(members):
+        if not is_live[k]: continue
+        for c, _ in mem:
+            if c in cand: cand[c].append(k)
+
+    rivals, recruit = [], []
+    for c in short:
+        g, key = enc['cell_keys'][c]
+        shortage = int(round(slack[c]))
+        contested = collections.Counter()
+        for k in cand[c]:
+            rest = counts[k] - takes[k]
+            if rest <= tol: continue
+            for r, _ in members[k]:
+                if r != c and full[r]:
+                    contested[r] += rest
+        for r, n in contested.most_common(top):
+            rivals.append({'group': g, 'key': key, 'shortage': shortage, 'rival_group': enc['cell_keys'][r][0],
+                           'rival_key': enc['cell_keys'][r][1], 'contested': int(round(n)), 'price': round(float(price[r]), 4)})
+
+        profiles = {}
+        for k in cand[c]:
+            prof = tuple(sorted(members[k]))
+            if prof in profiles: continue
+            gain = max(0.0, 1.0 - sum(m * price[x] for x, m in prof))
+            room = min([shortage] + [int(slack[x] // m) for x, m in prof if price[x] <= tol and x != c])
+            profiles[prof] = (gain, room)
+        best = sorted(profiles.items(), key=lambda t: (-t[1][0], -t[1][1]))[:top]
+        for prof, (gain, room) in best:
+            if gain <= tol: continue
+            recruit.append({'group': g, 'key': key, 'profile': [enc['cell_keys'][x] for x, _ in prof],
+                            'gain': round(gain, 4), 'room': room, 'unlock': int(np.floor(gain * room + tol))})
+
+    return {'lp_bound': float(takes.sum()),
+            'binding': rep_binding, 'rivals': rivals, 'recruit': recruit}
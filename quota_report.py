@@ -0,0 +1,322 @@
+"""
+쿼터 결과 집계 및 엑셀 출력 (Streamlit 비의존 모듈)
+
+쿼터 페이지와 헤드리스 실행(quota_cli)이 같은 결과 파일을 만들도록
+달성 현황 집계 / 부족 진단 / 결과 워크북 작성을 한곳에 모았습니다.
+"""
+import io
+import re
+import zipfile
+import collections
+import importlib.util
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+
+# ==============================================================================
+# 1. 표시용 헬퍼
+# ==============================================================================
+def natural_key(string_):
+    if not isinstance(string_, str): string_ = str(string_)
+    return [int(s) if s.isdigit() else s for s in re.split(r'(\d+)', string_)]
+
+def sanitize_sheet_name(name):
+    invalid_chars = [':', '\\', '/', '?', '*', '[', ']']
+    for char in invalid_chars: name = name.replace(char, '_')
+    return name[:31]
+
+def key_label(k):
+    """쿼터 키 표시 문자열 (튜플은 ' / ' 로 연결)"""
+    return " / ".join(k) if isinstance(k, tuple) else k
+
+
+# ==============================================================================
+# 2. 달성 현황 / 부족 진단
+# ==============================================================================
+def tally_selection(index, labels, m_keys, ex_keys_list):
+    """선택된 라벨의 메인/추가 쿼터 키별 달성 수. 반환: (final_m, final_exs)"""
+    final_m = collections.Counter()
+    final_exs = [collections.Counter() for _ in ex_keys_list]
+    for p in pd.Index(index).get_indexer(list(labels)):
+        if p < 0: continue
+        final_m[m_keys[p]] += 1
+        for j, k_list in enumerate(ex_keys_list):
+            for k in k_list[p]: final_exs[j][k] += 1
+    return final_m, final_exs
+
+def _reason(raw_avail, tgt, tier=0):
+    if tier:
+        return f"🔸 소프트 미충족 (우선순위 {tier})"
+    return "⚠️ 물리적 부족" if raw_avail < tgt else "⚔️ 경합 부족"
+
+def shortage_records(main_map, final_m, m_keys, ex_configs, final_exs, ex_keys_list, use_main=True, main_tier=0):
+    """
+    목표 대비 부족한 셀 목록
+    전체 보유 인원이 목표보다 적으면 물리적 부족, 아니면 다른 셀과의 경합 부족 (소프트 그룹은 소프트 미충족)
+    """
+    recs = []
+    if use_main:
+        m_cnt = collections.Counter(m_keys)
+        for k, tgt in main_map.items():
+            act = final_m.get(k, 0); diff = tgt - act
+            if diff > 0:
+                raw_avail = m_cnt.get(k, 0)
+                reason = _reason(raw_avail, tgt, main_tier)
+                recs.append({'순서': 0, '구분': '메인 쿼터', '항목': key_label(k), '목표': tgt, '현재': act, '부족': diff, '진단': reason, '전체보유': raw_avail})
+
+    for j, cfg in enumerate(ex_configs):
+        if cfg['cols']:
+            raw_cnt_map = collections.Counter(k for keys in ex_keys_list[j] for k in keys)
+            for k, tgt in cfg['map'].items():
+                act = final_exs[j].get(k, 0); diff = tgt - act
+                if diff > 0:
+                    raw_avail = raw_cnt_map.get(k, 0)
+                    reason = _reason(raw_avail, tgt, cfg.get('tier', 0))
+                    recs.append({'순서': j+1, '구분': cfg['name'], '항목': key_label(k), '목표': tgt, '현재': act, '부족': diff, '진단': reason, '전체보유': raw_avail})
+    return recs
+
+def shortage_frame(recs):
+    """부족 목록 -> 그룹 순서 + 항목 자연 정렬된 DataFrame (정렬용 컬럼 제거)"""
+    df = pd.DataFrame(recs)
+    df['sort_val'] = df['항목'].apply(lambda x: tuple(natural_key(x)))
+    df = df.sort_values(by=['순서', 'sort_val'], ascending=[True, True])
+    return df.drop(columns=['순서', 'sort_val'])
+
+
+# ==============================================================================
+# 3. 결과 파일 (엑셀 스트리밍 / CSV·Parquet 묶음)
+# ==============================================================================
+# 대용량 결과(Result_All)는 행 블록 단위로 씁니다
+EXPORT_CHUNK_ROWS = 5000
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+def _result_order(df_survey, labels, id_col):
+    """ID 기준 정렬 위치(한 번만 정렬)와 행별 통과 여부"""
+    pos = df_survey.index.get_indexer(list(labels))
+    passed = np.zeros(len(df_survey), dtype=bool)
+    passed[pos[pos >= 0]] = True
+    order = df_survey[id_col].reset_index(drop=True).sort_values(kind='stable').index.to_numpy()
+    return order, passed
+
+def summary_frames(recs, use_main, main_map, final_m, ex_configs, final_exs, run_info=None, bottleneck=None):
+    """결과 파일의 요약 시트 [(시트 이름, DataFrame)] - Shortage_Analysis / Main_Status / 추가 그룹별 / Bottleneck_* / Run_Info"""
+    frames = []
+    if recs:
+        frames.append(('Shortage_Analysis', shortage_frame(recs)))
+    if use_main:
+        frames.append(('Main_Status', pd.DataFrame([{'G': str(k), 'T': v, 'A': final_m[k]} for k, v in main_map.items()])))
+    for j, cfg in enumerate(ex_configs):
+        if cfg['cols']:
+            data_e = [{'Value': key_label(k), 'Target': t, 'Actual': final_exs[j][k], 'Diff': t - final_exs[j][k]} for k, t in cfg['map'].items()]
+            frames.append((cfg['name'], pd.DataFrame(data_e).sort_values('Value', key=lambda c: c.map(natural_key))))
+    if bottleneck:
+        group_names = ['메인 쿼터'] + [cfg['name'] for cfg in ex_configs]
+        names = ('Bottleneck_Rivals', 'Bottleneck_Recruit', 'Bottleneck_Prices')
+        frames.extend((n, f) for n, f in zip(names, bottleneck_frames(bottleneck, group_names)) if not f.empty)
+    # 재현/감사용 실행 정보
+    if run_info:
+        frames.append(('Run_Info', pd.DataFrame([{'항목': k, '값': v} for k, v in run_info])))
+    return frames
+
+def _result_blocks(df_survey, order, passed, pass_only=False):
+    """정렬된 결과 행을 Chk 컬럼을 붙인 DataFrame 블록으로 (원본은 수정하지 않음)"""
+    if pass_only:
+        order = order[passed[order]]
+    if not len(order):
+        yield df_survey.iloc[:0].assign(Chk=[])   # 머리글만
+    for s in range(0, len(order), EXPORT_CHUNK_ROWS):
+        pos = order[s:s + EXPORT_CHUNK_ROWS]
+        yield df_survey.iloc[pos].assign(Chk=np.where(passed[pos], "통과", "제외"))
+
+def _row_values(block):
+    """블록 -> 행 튜플 (NumPy 컬럼 배열을 한 번에 파이썬 값으로, 결측 -> None)"""
+    cols = []
+    for c in block.columns:
+        s = block[c]
+        if pd.api.types.is_float_dtype(s.dtype):
+            a = s.to_numpy(dtype=np.float64, na_value=np.nan)
+            cols.append(np.where(np.isnan(a), None, a).tolist())
+        elif (pd.api.types.is_integer_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype)) and not s.hasnans:
+            cols.append(s.tolist())
+        else:
+            cols.append(s.astype(object).where(s.notna(), None).tolist())
+    return zip(*cols)
+
+def _write_sheet(wb, name, blocks, header_fmt):
+    """블록 순서대로 행 단위 기록 (constant_memory 모드는 행 순서 쓰기만 허용)"""
+    ws = wb.add_worksheet(name)
+    r = 0
+    for block in blocks:
+        if r == 0:
+            ws.write_row(0, 0, [str(c) for c in block.columns], header_fmt)
+            r = 1
+        for row in _row_values(block):
+            ws.write_row(r, 0, row)
+            r += 1
+
+def write_result_workbook(out, df_survey, labels, id_col, recs, use_main, main_map, final_m, ex_configs, final_exs, run_info=None, bottleneck=None):
+    """
+    Result_All / Result_Pass / 요약 시트(summary_frames) 작성
+    xlsxwriter constant_memory 모드로 행 블록을 바로 흘려 쓰며, ID 정렬은 한 번만 합니다.
+    out 은 파일 경로 또는 BytesIO. 원본 df_survey 는 수정하지 않습니다. 반환: 통과 인원 수
+    """
+    order, passed = _result_order(df_survey, labels, id_col)
+    wb = xlsxwriter.Workbook(out, {'constant_memory': True, 'strings_to_formulas': False, 'strings_to_urls': False,
+                                   'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    header_fmt = wb.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    try:
+        _write_sheet(wb, 'Result_All', _result_blocks(df_survey, order, passed), header_fmt)
+        _write_sheet(wb, 'Result_Pass', _result_blocks(df_survey, order, passed, pass_only=True), header_fmt)
+        for name, frame in summary_frames(recs, use_main, main_map, final_m, ex_configs, final_exs, run_info, bottleneck):
+            _write_sheet(wb, name, [frame], header_fmt)
+    finally:
+        wb.close()
+    return int(passed.sum())
+
+def write_result_archive(out, df_survey, labels, id_col, recs, use_main, main_map, final_m, ex_configs, final_exs,
+                         run_info=None, bottleneck=None, fmt='csv'):
+    """
+    워크북과 같은 시트를 '<시트 이름>.csv' (UTF-8 BOM) 또는 '.parquet' 파일로 묶은 zip 작성 (엑셀보다 빠름)
+    parquet 은 pyarrow 가 필요합니다. 반환: 통과 인원 수
+    """
+    if fmt == 'parquet' and not PARQUET_AVAILABLE:
+        raise ImportError("parquet 출력에는 pyarrow 패키지가 필요합니다.")
+    order, passed = _result_order(df_survey, labels, id_col)
+    big = [('Result_All', False), ('Result_Pass', True)]
+    with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, pass_only in big:
+            if fmt == 'parquet':
+                _write_parquet(zf, name, pd.concat(list(_result_blocks(df_survey, order, passed, pass_only))))
+                continue
+            with zf.open(f"{name}.csv", 'w') as raw, io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as f:
+                for b, block in enumerate(_result_blocks(df_survey, order, passed, pass_only)):
+                    block.to_csv(f, index=False, header=b == 0)
+        for name, frame in summary_frames(recs, use_main, main_map, final_m, ex_configs, final_exs, run_info, bottleneck):
+            if fmt == 'parquet':
+                _write_parquet(zf, name, frame)
+            else:
+                zf.writestr(f"{name}.csv", frame.to_csv(index=False).encode('utf-8-sig'))
+    return int(passed.sum())
+
+def _write_parquet(zf, name, frame):
+    """혼합형 object 컬럼은 문자열로 바꿔 parquet 으로 기록"""
+    obj = [c for c in frame.columns if frame[c].dtype == object]
+    frame = frame.astype({c: 'string' for c in obj})
+    frame.columns = [str(c) for c in frame.columns]
+    buf = io.BytesIO()
+    frame.to_parquet(buf, index=False)
+    zf.writestr(f"{name}.parquet", buf.getvalue())
+
+
+# ==============================================================================
+# 4. 시나리오 비교 워크북
+# ==============================================================================
+def scenario_frames(results):
+    """시나리오 결과 -> (비교 표, 시나리오별 부족 셀 표)"""
+    compare = pd.DataFrame([{
+        '시나리오': r['name'], '허용 오차': r['tol'], '전체 목표': r['target_total'], '달성 기준': r['soft_target'],
+        '달성 상한': r['bound'], '매칭 수': r['count'], '달성률(%)': round(r['count'] / max(r['target_total'], 1) * 100, 1),
+        '부족 셀 수': len(r['recs']), '부족 인원 합': sum(x['부족'] for x in r['recs']),
+        '결과': '실패' if r['is_fail'] else '달성',
+    } for r in results])
+    shortage = [shortage_frame(r['recs']).assign(시나리오=r['name']) for r in results if r['recs']]
+    shortage = pd.concat(shortage, ignore_index=True) if shortage else pd.DataFrame()
+    if not shortage.empty:
+        shortage = shortage[['시나리오'] + [c for c in shortage.columns if c != '시나리오']]
+    return compare, shortage
+
+def write_scenario_workbook(out, results):
+    """Scenario_Compare / Scenario_Shortage 시트 작성"""
+    compare, shortage = scenario_frames(results)
+    with pd.ExcelWriter(out, engine='xlsxwriter') as w:
+        compare.to_excel(w, index=False, sheet_name='Scenario_Compare')
+        if not shortage.empty:
+            shortage.to_excel(w, index=False, sheet_name='Scenario_Shortage')
+
+
+# ==============================================================================
+# 5. 병목 진단 표
+# ==============================================================================
+def bottleneck_frames(rep, group_names):
+    """
+    quota_exact.bottleneck_report 결과 -> (경합 셀 표, 추가 모집 표, 묶인 셀 표)
+    group_names: 그룹 번호 -> 표시 이름 (0 = 메인 쿼터)
+    """
+    rivals = pd.DataFrame([{
+        '구분': group_names[r['group']], '부족 항목': key_label(r['key']), '부족': r['shortage'],
+        '경합 구분': group_names[r['rival_group']], '경합 항목': key_label(r['rival_key']),
+        '막힌 후보 수': r['contested'], '경합 셀 쌍대가격': r['price'],
+    } for r in rep['rivals']])
+    recruit = pd.DataFrame([{
+        '구분': group_names[r['group']], '부족 항목': key_label(r['key']),
+        '모집 유형': ", ".join(f"{group_names[g]}={key_label(k)}" for g, k in r['profile']),
+        '1명당 추가 달성': r['gain'], '효과 유지 인원': r['room'], '기대 추가 달성': r['unlock'],
+    } for r in rep['recruit']])
+    prices = pd.DataFrame([{
+        '묶음': b['joint'], '구분': group_names[b['group']], '항목': key_label(b['key']), '목표': b['target'],
+        '목표 +1 당 추가 달성': b['price'],
+    } for b in rep['binding']])
+    if not prices.empty:
+        prices = prices.sort_values(['묶음', '목표 +1 당 추가 달성'], ascending=[True, False])
+    return rivals, recruit, prices
+
+
+# ==============================================================================
+# 6. 결과 시각화용 표 (셀 수와 무관하게 차트 데이터 크기를 제한)
+# ==============================================================================
+def status_frame(q_map, actual, dims=None):
+    """
+    목표 / 달성 / 부족 / 달성률 표 (항목 자연 정렬은 여기서 한 번만)
+    dims: 튜플 키의 차원 이름 - 주면 차원별 값 컬럼을 추가해 히트맵 집계에 사용
+    """
+    keys = list(q_map)
+    labels = [key_label(k) for k in keys]
+    order = sorted(range(len(keys)), key=lambda i: natural_key(labels[i]))
+    frame = pd.DataFrame({'항목': [labels[i] for i in order]})
+    if dims:
+        for d, name in enumerate(dims):
+            frame[name] = [keys[i][d] for i in order]
+    frame['목표'] = [q_map[keys[i]] for i in order]
+    frame['달성'] = [actual.get(keys[i], 0) for i in order]
+    return _with_rates(frame)
+
+def _with_rates(frame):
+    frame['부족'] = (frame['목표'] - frame['달성']).clip(lower=0)
+    frame['달성률(%)'] = (frame['달성'] / frame['목표'].where(frame['목표'] > 0) * 100).round(1)
+    return frame
+
+def _dim_names(cols):
+    """차원 컬럼 이름 (같은 변수를 두 번 쓰거나 표 고정 컬럼과 겹치면 차원 집계 생략)"""
+    names = [str(c) for c in cols]
+    if len(set(names)) != len(names) or set(names) & {'항목', '목표', '달성', '부족', '달성률(%)'}:
+        return None
+    return names
+
+def status_views(use_main, main_map, final_m, main_cols, ex_configs, final_exs):
+    """탭별 (이름, status_frame, 차원 이름) - 메인 쿼터 미사용이면 메인 탭의 표는 None"""
+    views = [('메인 쿼터', None, None)]
+    if use_main:
+        dims = _dim_names(main_cols)
+        views[0] = ('메인 쿼터', status_frame(main_map, final_m, dims), dims)
+    for j, cfg in enumerate(ex_configs):
+        if cfg['cols']:
+            dims = _dim_names(cfg['cols']) if cfg['mode'] == 'grid' else None
+            views.append((cfg['name'], status_frame(cfg['map'], final_exs[j], dims), dims))
+    return views
+
+def top_shortfalls(status, n=20):
+    """부족 인원이 큰 순서로 상위 n 개 셀"""
+    short = status[status['부족'] > 0]
+    return short.nlargest(n, '부족', keep='first')
+
+def heatmap_frame(status, row_dim, col_dim, filters=None):
+    """
+    status_frame -> 두 차원 교차 합계 (나머지 차원은 합산)
+    filters: {차원: 값} 드릴다운 - 해당 값의 셀만 남긴 뒤 집계
+    """
+    frame = status
+    for dim, val in (filters or {}).items():
+        frame = frame[frame[dim] == val]
+    agg = frame.groupby([row_dim, col_dim], sort=False)[['목표', '달성']].sum().reset_index()
+    return _with_rates(agg)
@@ -0,0 +1,176 @@
+"""
+쿼터 키 추출 및 희소성 점수 (벡터화, Streamlit 비의존 모듈)
+
+쿼터 페이지의 행 단위 apply / Counter 루프와 같은 결과를 컬럼 단위 연산으로 계산합니다.
+"""
+import itertools
+import numpy as np
+import pandas as pd
+
+# 목표가 없는 키의 희소성 (기존 화면 로직과 동일)
+NO_TARGET_SCORE = 999
+
+# 보조 우선순위(intval) 가중치: 순위 [0, 1] x 가중치가 서로 다른 희소성 값의 차이보다 작아야 동점 처리로만 작동
+PRIORITY_WEIGHT = 1e-6
+
+
+# ==============================================================================
+# 1. 키 추출
+# ==============================================================================
+def normalize_value(v):
+    """값 1개 정규화 (normalize_val 과 동일)"""
+    t = str(v).strip()
+    return t[:-2] if t.endswith('.0') else t
+
+def _normalize_uniques(u):
+    """
+    고유값 배열 정규화 (dtype 별 벡터 경로, 결과는 normalize_value 와 동일)
+    - 정수값 실수: int64 -> 문자열 한 번에 변환 (|값| < 1e16, -0.0 없음)
+    - 정수 / 불리언: 문자열 변환
+    - 문자열: .str.strip() 후 끝의 '.0' 제거
+    - 그 외(혼합형 등): 값별 normalize_value
+    """
+    u = pd.Series(u)
+    if pd.api.types.is_float_dtype(u.dtype):
+        v = u.to_numpy(dtype=np.float64)
+        if np.isfinite(v).all() and (np.abs(v) < 1e16).all() and (v == np.round(v)).all() and not np.signbit(v[v == 0]).any():
+            return v.astype(np.int64).astype(str).astype(object)
+    elif pd.api.types.is_integer_dtype(u.dtype) or pd.api.types.is_bool_dtype(u.dtype):
+        return u.astype(str).to_numpy(dtype=object)
+    elif pd.api.types.infer_dtype(u, skipna=False) == 'string':
+        return u.str.strip().str.removesuffix('.0').to_numpy(dtype=object)
+    return np.array([normalize_value(v) for v in u], dtype=object)
+
+def normalize_column(s):
+    """
+    컬럼 단위 정규화: NaN -> "", 문자열 변환 + 공백 제거 + 끝의 '.0' 제거 (normalize_val 과 동일)
+    고유값만 dtype 별 벡터 경로로 변환한 뒤 코드로 펼칩니다. 범주형은 범주만 변환합니다.
+    object 컬럼은 문자열로 바꾼 뒤 코드화합니다 (factorize 는 True == 1 == 1.0 을 같은 값으로 묶으므로).
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+    elif s.dtype == object:
+        codes, uniques = pd.factorize(s.astype(str).where(s.notna()), use_na_sentinel=True)
+    else:
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    table = np.append(_normalize_uniques(uniques), "").astype(object)   # 코드 -1 (NaN) -> ""
+    return pd.Series(table[codes], index=s.index, dtype=object)
+
+def normalized(df, col, cache=None):
+    """
+    df[col] 정규화 결과. cache(dict) 를 주면 컬럼 이름별로 저장해 같은 컬럼을 두 번 변환하지 않습니다.
+    cache 는 같은 데이터에 대해서만 재사용해야 합니다 (데이터가 바뀌면 새 dict).
+    """
+    if cache is None:
+        return normalize_column(df[col])
+    if col not in cache:
+        cache[col] = normalize_column(df[col])
+    return cache[col]
+
+def extract_main_keys(df, cols, cache=None):
+    """메인 쿼터 키 (행별 튜플). cols 가 비어 있으면 ('All',)"""
+    if not cols:
+        return [('All',)] * len(df)
+    return list(zip(*[normalized(df, c, cache).tolist() for c in cols]))
+
+def extract_extra_keys(df, cfg, cache=None):
+    """
+    추가 쿼터 키 (행별 리스트)
+    단순형: 선택한 변수들의 값 각각이 키 / 조합형: 변수 값 튜플 1개가 키
+    """
+    if not cfg['cols']:
+        return [[] for _ in range(len(df))]
+    cols = [normalized(df, c, cache).tolist() for c in cfg['cols']]
+    if cfg['mode'] == 'simple':
+        return [list(t) for t in zip(*cols)]
+    return [[t] for t in zip(*cols)]
+
+
+# ==============================================================================
+# 2. 희소성 점수
+# ==============================================================================
+def _factorize(keys):
+    """해시 가능한 키 리스트 -> (정수 코드, 고유키 배열)"""
+    ser = pd.Series(keys, dtype=object) if len(keys) else pd.Series([], dtype=object)
+    codes, uniques = pd.factorize(ser)
+    return codes, list(uniques)
+
+def _ratio_per_code(codes, uniques, q_map):
+    """코드별 (보유 수 / 목표) - 목표가 없거나 0 이하면 999"""
+    cnt = np.bincount(codes, minlength=len(uniques)).astype(np.float64)
+    tgt = np.array([q_map.get(k, 0) for k in uniques], dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(tgt > 0, cnt / tgt, NO_TARGET_SCORE)
+
+def _extra_basis(key_lists):
+    """추가 그룹 키 평탄화 + 코드화 (목표와 무관). 그룹 전체에 키가 없으면 None"""
+    lengths = np.fromiter((len(k) for k in key_lists), dtype=np.int64, count=len(key_lists))
+    if lengths.sum() == 0:
+        return None
+    codes, uniques = _factorize(list(itertools.chain.from_iterable(key_lists)))
+    has = lengths > 0
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return {'n': len(key_lists), 'codes': codes, 'uniques': uniques, 'has': has, 'starts': starts[has]}
+
+def _extra_from_basis(b, ex_map):
+    flat_ratio = _ratio_per_code(b['codes'], b['uniques'], ex_map)[b['codes']]
+    out = np.ones(b['n'], dtype=np.float64)
+    out[b['has']] = np.minimum.reduceat(flat_ratio, b['starts'])
+    return out
+
+def main_scarcity(m_keys, main_map):
+    """메인 쿼터 희소성: 키별 보유 수 / 목표"""
+    codes, uniques = _factorize(m_keys)
+    return _ratio_per_code(codes, uniques, main_map)[codes]
+
+def extra_scarcity(key_lists, ex_map):
+    """
+    추가 쿼터 희소성: 행이 가진 키들의 (전체 등장 수 / 목표) 중 최솟값
+    키가 없는 행은 1.0, 그룹 전체에 키가 없으면 None (비활성 그룹)
+    """
+    b = _extra_basis(key_lists)
+    return None if b is None else _extra_from_basis(b, ex_map)
+
+def score_basis(m_keys, ex_keys_list):
+    """
+    목표값과 무관한 키 코드화를 한 번만 수행합니다 (시나리오 일괄 실행에서 공유).
+    목표가 바뀌면 고유키별 목표 조회만 다시 합니다.
+    """
+    return {'n': len(m_keys), 'main': _factorize(m_keys), 'extras': [_extra_basis(k) for k in ex_keys_list]}
+
+def basis_scores(basis, main_map, ex_maps_list, use_main=True):
+    """score_basis + 목표 -> final_scarcity_scores"""
+    if use_main:
+        codes, uniques = basis['main']
+        scores = _ratio_per_code(codes, uniques, main_map)[codes]
+    else:
+        scores = np.ones(basis['n'])
+    for b, ex_map in zip(basis['extras'], ex_maps_list):
+        if b is not None:
+            scores = scores + _extra_from_basis(b, ex_map)
+    return scores
+
+def scarcity_scores(m_keys, ex_keys_list, main_map, ex_maps_list, use_main=True):
+    """final_scarcity_scores = 메인 희소성 + 활성 추가 그룹 희소성 합"""
+    return basis_scores(score_basis(m_keys, ex_keys_list), main_map, ex_maps_list, use_main=use_main)
+
+
+# ==============================================================================
+# 3. 보조 우선순위 (intval)
+# ==============================================================================
+def priority_rank(values, higher_first=True):
+    """
+    보조 우선순위 컬럼 -> [0, 1] 백분위 순위 (1 이 가장 우선). 숫자가 아니거나 빈 값은 0 (가장 나중)
+    값의 단위/분포와 무관하게 같은 가중치로 접을 수 있도록 순위로 변환합니다.
+    """
+    v = pd.to_numeric(pd.Series(values), errors='coerce')
+    r = v.rank(method='average', pct=True, ascending=higher_first)
+    return r.fillna(0.0).to_numpy(dtype=np.float64)
+
+def with_priority(scores, values, higher_first=True, weight=PRIORITY_WEIGHT):
+    """
+    희소성 점수에 보조 우선순위를 접어 넣습니다 (정렬 키 한 번 계산, 반복마다 추가 비용 없음).
+    희소성 순서는 바꾸지 않고, 소속 셀이 같은 응답자(동치 클래스) 중 누구를 뽑을지 정할 때
+    우선순위가 높은 응답자부터 선택됩니다 (그리디 / 보정 / 정확해 / 웜 스타트 공통).
+    """
+    return np.asarray(scores, dtype=np.float64) + weight * priority_rank(values, higher_first)
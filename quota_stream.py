@@ -0,0 +1,239 @@
+"""
+웨이브(일별 배치) 단위 증분 쿼터 할당 (Streamlit 비의존 모듈)
+
+실사 데이터가 매일 추가될 때 누적 파일 전체를 다시 풀지 않고, 저장된 할당 상태
+(셀별 잔여 목표, 현재 선택, 응답자별 키)에 새 배치만 점수 계산/할당합니다.
+- 기본: 새 응답자만 남은 목표에 대해 그리디 할당 (비용 = 새 행 수)
+- repair=True: 이전 웨이브의 미선택 응답자까지 후보로 넣고 시간 제한 보정 (기존 선택은 고정)
+
+명령행:
+    python quota_stream.py init 쿼터.xlsx --state wave.pkl --main-cols 성별 연령 지역 --id-col ID
+    python quota_stream.py add 1일차.csv --state wave.pkl
+    python quota_stream.py add 2일차.csv --state wave.pkl --repair
+    python quota_stream.py export --state wave.pkl -o selected.xlsx
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+import quota_cli
+import quota_engine
+import quota_report
+import quota_scoring
+
+STATE_VERSION = 1
+
+
+# ==============================================================================
+# 1. 상태 생성 / 저장
+# ==============================================================================
+def init_state(main_map, ex_configs, id_col, main_cols=None, priority_col=None, priority_high_first=True):
+    """
+    빈 할당 상태. 잔여 목표는 원래 목표로 시작합니다.
+    main_cols 가 없으면 메인 쿼터 없이 전체 목표만 사용 (main_map = {('All',): 전체 목표})
+    """
+    use_main = bool(main_cols)
+    if not use_main:
+        main_map = {('All',): int(sum(main_map.values()))}
+    ex_configs = [{'cols': list(cfg['cols']), 'map': dict(cfg['map']), 'name': cfg['name'], 'mode': cfg['mode']} for cfg in ex_configs]
+    return {
+        'version': STATE_VERSION,
+        'config': {
+            'main_cols': list(main_cols or []), 'use_main': use_main, 'main_map': dict(main_map), 'ex_configs': ex_configs,
+            'id_col': id_col, 'priority_col': priority_col, 'priority_high_first': priority_high_first,
+        },
+        'ids': [],                 # 응답자 ID (정규화 문자열, 도착 순)
+        'id_pos': {},              # ID -> 위치
+        'm_keys': [],
+        'ex_keys_list': [[] for _ in ex_configs],
+        'priority': [],            # 보조 우선순위 원값 (priority_col 지정 시)
+        'selected': [],            # 선택 위치 (선택 순)
+        'remaining': {
+            'main': {k: quota_engine._to_cap(v) for k, v in main_map.items()},
+            'extra': [{k: quota_engine._to_cap(v) for k, v in cfg['map'].items()} for cfg in ex_configs],
+        },
+        'waves': [],
+    }
+
+def save_state(state, path):
+    """임시 파일에 쓴 뒤 교체 (저장 중 중단되어도 이전 상태 유지)"""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(state, f, protocol=4)
+    os.replace(tmp, path)
+
+def load_state(path):
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+    if state.get('version') != STATE_VERSION:
+        raise ValueError(f"지원하지 않는 상태 파일 버전입니다: {state.get('version')}")
+    return state
+
+
+# ==============================================================================
+# 2. 웨이브 추가
+# ==============================================================================
+def _deduct(remaining, m_key, ex_keys):
+    """선택 1명의 셀 사용량을 잔여 목표에서 차감"""
+    if m_key in remaining['main']:
+        remaining['main'][m_key] -= 1
+    for rem, keys in zip(remaining['extra'], ex_keys):
+        for k in keys:
+            if k in rem:
+                rem[k] -= 1
+
+def add_wave(state, df_batch, iters=2000, seed=None, repair=False, repair_time=5.0, n_workers=None, backend="threads"):
+    """
+    새 배치를 상태에 추가하고 남은 목표에 대해 할당합니다 (state 를 제자리 갱신).
+    이미 본 ID 와 배치 안 중복 ID 는 건너뜁니다.
+    반환 dict: wave, new_rows, duplicates, selected_new, total_selected, target_total, remaining_total
+    """
+    cfg = state['config']
+    ids = quota_scoring.normalize_column(df_batch[cfg['id_col']]).tolist()
+    new_rows, dup = [], 0
+    batch_seen = set()
+    for r, v in enumerate(ids):
+        if v in state['id_pos'] or v in batch_seen:
+            dup += 1
+            continue
+        batch_seen.add(v)
+        new_rows.append(r)
+    df_new = df_batch.iloc[new_rows]
+
+    # 새 행만 키 추출 후 상태에 추가
+    m_new = quota_scoring.extract_main_keys(df_new, cfg['main_cols'] if cfg['use_main'] else [])
+    ex_new = [quota_scoring.extract_extra_keys(df_new, c) for c in cfg['ex_configs']]
+    start = len(state['ids'])
+    for r in new_rows:
+        state['id_pos'][ids[r]] = len(state['ids'])
+        state['ids'].append(ids[r])
+    state['m_keys'].extend(m_new)
+    for store, keys in zip(state['ex_keys_list'], ex_new):
+        store.extend(keys)
+    if cfg['priority_col'] is not None:
+        state['priority'].extend(df_new[cfg['priority_col']].tolist())
+
+    # 후보: 새 응답자 (+ repair 시 이전 미선택 응답자)
+    pool = list(range(start, len(state['ids'])))
+    if repair:
+        chosen = set(state['selected'])
+        pool = [p for p in range(start) if p not in chosen] + pool
+    rem = state['remaining']
+    rem_main = {k: max(0, v) for k, v in rem['main'].items()}
+    rem_ex = [{k: max(0, v) for k, v in m.items()} for m in rem['extra']]
+    need = sum(rem_main.values())
+
+    picked = []
+    if pool and need > 0:
+        p_m = [state['m_keys'][p] for p in pool]
+        p_ex = [[keys[p] for p in pool] for keys in state['ex_keys_list']]
+        scores = quota_scoring.scarcity_scores(p_m, p_ex, rem_main, rem_ex, use_main=cfg['use_main'])
+        if cfg['priority_col'] is not None:
+            scores = quota_scoring.with_priority(scores, [state['priority'][p] for p in pool], cfg['priority_high_first'])
+        _, picked = quota_engine.run_simulations(
+            iters, np.asarray(pool, dtype=np.int64), scores, p_m, p_ex, rem_main, rem_ex, need,
+            n_workers=n_workers, backend=backend, repair=repair, repair_time=repair_time, seed=seed
+        )
+        picked = [int(p) for p in picked]
+    for p in picked:
+        state['selected'].append(p)
+        _deduct(rem, state['m_keys'][p], [keys[p] for keys in state['ex_keys_list']])
+
+    summary = {
+        'wave': len(state['waves']) + 1, 'new_rows': len(new_rows), 'duplicates': dup,
+        'selected_new': len(picked), 'total_selected': len(state['selected']),
+        'target_total': int(sum(quota_engine._to_cap(v) for v in cfg['main_map'].values())),
+        'remaining_total': int(sum(max(0, v) for v in rem['main'].values())),
+        'repair': bool(repair), 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    state['waves'].append(summary)
+    return summary
+
+
+# ==============================================================================
+# 3. 현황 / 내보내기
+# ==============================================================================
+def selected_ids(state):
+    return [state['ids'][p] for p in state['selected']]
+
+def status_frames(state):
+    """(웨이브 이력, 셀별 목표 / 선택 / 잔여) DataFrame"""
+    cfg = state['config']
+    waves = pd.DataFrame(state['waves'])
+    rows = []
+    groups = [('메인 쿼터', cfg['main_map'], state['remaining']['main'])] + \
+             [(c['name'], c['map'], r) for c, r in zip(cfg['ex_configs'], state['remaining']['extra'])]
+    for name, q_map, rem in groups:
+        for k, v in q_map.items():
+            tgt = quota_engine._to_cap(v)
+            rows.append({'구분': name, '항목': quota_report.key_label(k), '목표': tgt, '선택': tgt - rem.get(k, 0), '잔여': max(0, rem.get(k, 0))})
+    return waves, pd.DataFrame(rows)
+
+def write_status_workbook(state, out):
+    """Selected (선택 ID) / Waves (웨이브 이력) / Cell_Status (셀별 현황) 시트 작성"""
+    waves, cells = status_frames(state)
+    with pd.ExcelWriter(out, engine='xlsxwriter') as w:
+        pd.DataFrame({state['config']['id_col']: selected_ids(state)}).to_excel(w, index=False, sheet_name='Selected')
+        waves.to_excel(w, index=False, sheet_name='Waves')
+        cells.to_excel(w, index=False, sheet_name='Cell_Status')
+
+
+# ==============================================================================
+# 4. 명령행 진입점
+# ==============================================================================
+def build_parser():
+    p = argparse.ArgumentParser(prog="quota-stream", description="웨이브 단위 증분 쿼터 할당")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    q = sub.add_parser("init", help="쿼터 파일로 빈 할당 상태 생성")
+    q.add_argument("spec", help="쿼터 파일 (quota_cli 와 같은 형식)")
+    q.add_argument("--state", required=True, help="상태 파일 경로")
+    q.add_argument("--id-col", required=True, help="응답자 ID 컬럼")
+    q.add_argument("--main-cols", nargs="+", metavar="COL", help="메인 쿼터 키 열 순서대로 대응하는 변수 (생략 시 전체 목표만 사용)")
+    q.add_argument("--intval", metavar="COL", help="보조 우선순위(intval) 컬럼")
+    q.add_argument("--intval-low-first", action="store_true", help="intval 값이 낮은 응답자 우선")
+
+    a = sub.add_parser("add", help="새 배치를 남은 목표에 대해 할당")
+    a.add_argument("data", help="새 배치 데이터 (csv / xlsx / xls)")
+    a.add_argument("--state", required=True, help="상태 파일 경로")
+    a.add_argument("--iters", type=int, default=2000, help="시도 횟수 (기본: 2000)")
+    a.add_argument("--seed", type=int, help="난수 시드")
+    a.add_argument("--repair", action="store_true", help="이전 미선택 응답자까지 포함해 보정 (기존 선택은 유지)")
+    a.add_argument("--repair-time", type=float, default=5.0, help="보정 시간 제한(초) (기본: 5)")
+    a.add_argument("--backend", choices=["threads", "processes"], default="threads")
+    a.add_argument("--workers", type=int, help="워커 수 (기본: CPU 코어 수)")
+
+    e = sub.add_parser("export", help="선택 ID / 웨이브 이력 / 셀별 현황 저장")
+    e.add_argument("--state", required=True, help="상태 파일 경로")
+    e.add_argument("-o", "--out", default="selected.xlsx", help="저장 경로 (기본: selected.xlsx)")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.cmd == "init":
+        main_map, ex_configs = quota_cli.load_quota_spec(args.spec, len(args.main_cols) if args.main_cols else 3)
+        state = init_state(main_map, ex_configs, args.id_col, args.main_cols, args.intval, not args.intval_low_first)
+        save_state(state, args.state)
+        print(f"상태 생성: {args.state} (전체 목표 {sum(state['remaining']['main'].values()):,}명)")
+    elif args.cmd == "add":
+        state = load_state(args.state)
+        res = add_wave(state, quota_cli.read_table(args.data), iters=args.iters, seed=args.seed, repair=args.repair,
+                       repair_time=args.repair_time, n_workers=args.workers, backend=args.backend)
+        save_state(state, args.state)
+        print(f"웨이브 {res['wave']}: 새 응답자 {res['new_rows']:,}명 (중복 {res['duplicates']:,}명) -> 선택 {res['selected_new']:,}명")
+        print(f"누적 선택 {res['total_selected']:,}명 / 목표 {res['target_total']:,}명 (잔여 {res['remaining_total']:,}명)")
+    else:
+        state = load_state(args.state)
+        write_status_workbook(state, args.out)
+        print(f"결과 저장: {args.out} (선택 {len(state['selected']):,}명)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
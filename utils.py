@@ -1,10 +1,21 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import re
-import collections
 import chardet
-import io
+import hashlib
+
+import quota_scoring
+# 결과 파일 헬퍼 / 쿼터 파일 변환 / 솔버 본체는 Streamlit 비의존 모듈(quota_report.py / quota_cli.py / quota_engine.py)로
+# 분리됨 - 기존 호출 호환용 재노출
+from quota_report import natural_key, sanitize_sheet_name
+from quota_cli import transform_pivoted_quota
+from quota_engine import simulation_worker, run_simulations
+
+__all__ = [
+    'check_password', 'load_df', 'clean_val', 'collect_values_from_cols',
+    'file_signature', 'grid_counts', 'simple_counts',
+    # 재노출
+    'natural_key', 'sanitize_sheet_name', 'transform_pivoted_quota', 'simulation_worker', 'run_simulations',
+]
 
 # ==============================================================================
 # 1. 비밀번호 및 보안 설정
@@ -75,10 +86,6 @@ def clean_val(x):
     if pd.isna(x): return ""
     return str(x).strip()
 
-def natural_key(string_):
-    if not isinstance(string_, str): string_ = str(string_)
-    return [int(s) if s.isdigit() else s for s in re.split(r'(\d+)', string_)]
-
 def collect_values_from_cols(row, cols):
     vals = []
     for c in cols:
@@ -86,91 +93,36 @@ def collect_values_from_cols(row, cols):
         vals.append(v if not pd.isna(v) else "")
     return vals
 
-def sanitize_sheet_name(name):
-    invalid_chars = [':', '\\', '/', '?', '*', '[', ']']
-    for char in invalid_chars: name = name.replace(char, '_')
-    return name[:31]
-
 
 # ==============================================================================
-# 4. 쿼터 솔루션 엔진 (Index Safe Version)
+# 4. 쿼터 설정 표 캐시 (위젯 조작마다 재실행되는 스크립트에서 재계산 방지)
 # ==============================================================================
-def transform_pivoted_quota(df_raw):
-    df = df_raw.fillna(method='ffill', axis=0)
-    if len(df_raw.columns) >= 4:
-        df_raw.columns = ['qt1', 'qt2', 'qt3', 'target'] + list(df_raw.columns[4:])
-        return df_raw[['qt1', 'qt2', 'qt3', 'target']]
-    return pd.DataFrame()
-
-def simulation_worker(worker_id, iters, indices, scores, m_keys, ex_keys_list, main_map, ex_maps_list, target_threshold):
+def file_signature(file):
+    """업로드 파일 내용 해시 (설정 표 캐시 키)"""
+    return hashlib.md5(file.getvalue()).hexdigest()
+
+def _sorted_categorical(v):
+    """정규화된 값 -> 자연 정렬 범주형 컬럼"""
+    return pd.Categorical(v, categories=sorted(v.unique(), key=natural_key), ordered=True)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def grid_counts(data_sig, _df, cols, _cache=None):
     """
-    [안전장치 추가됨]
-    indices: 원본 데이터프레임의 인덱스 라벨 (예: 1001, 1002...)
-    m_keys, ex_keys_list: 0번부터 순서대로 정렬된 리스트
+    조합형(행/열 교차) 현재 인원 표: 마지막 변수를 열로 펼친 피벗 (값은 쿼터 키와 같은 정규화)
+    (data_sig, cols) 기준으로 캐시하므로 같은 데이터/변수면 정규화/정렬/groupby 를 다시 하지 않습니다.
+    _cache: 컬럼별 정규화 결과 dict (quota_scoring.normalized) - 키 추출 단계와 공유
     """
-    n = len(indices)
-    best_cnt = -1
-    best_idxs = []
-    
-    # 내림차순 정렬 (점수 높은 순)
-    base_order = np.argsort(scores)[::-1]
-    
-    for _ in range(iters):
-        # 1. 셔플 (노이즈 추가)
-        noise = np.random.normal(0, 0.5, n)
-        noisy_scores = scores + noise
-        
-        # current_order는 0부터 N-1까지의 '순서(Position)'를 담고 있음
-        current_order = np.argsort(noisy_scores)[::-1]
-        
-        # 2. 그리디 매칭
-        curr_main_map = main_map.copy()
-        curr_ex_maps = [m.copy() for m in ex_maps_list]
-        
-        selected = []
-        success_cnt = 0
-        
-        for idx_pos in current_order:
-            # idx_pos: 리스트 내의 위치 (0 ~ N-1)
-            
-            # 메인 쿼터 키 조회 (위치 기반)
-            m_key = m_keys[idx_pos]
-            
-            if curr_main_map.get(m_key, 0) > 0:
-                pass_all_extras = True
-                
-                # 서브 쿼터 체크
-                for j, ex_key_list in enumerate(ex_keys_list):
-                    # 해당 사람의 서브 쿼터 키 조회 (위치 기반)
-                    keys_for_person = ex_key_list[idx_pos]
-                    
-                    if not keys_for_person: continue
-                    
-                    for k in keys_for_person:
-                        if k in curr_ex_maps[j]:
-                            if curr_ex_maps[j][k] <= 0:
-                                pass_all_extras = False
-                                break
-                    if not pass_all_extras: break
-                
-                if pass_all_extras:
-                    # 매칭 성공 -> 차감
-                    curr_main_map[m_key] -= 1
-                    
-                    for j, ex_key_list in enumerate(ex_keys_list):
-                        keys_for_person = ex_key_list[idx_pos]
-                        for k in keys_for_person:
-                            if k in curr_ex_maps[j]:
-                                curr_ex_maps[j][k] -= 1
-                    
-                    # [중요] 결과에는 원본 데이터프레임의 '라벨 인덱스'를 저장
-                    selected.append(indices[idx_pos])
-                    success_cnt += 1
-        
-        if success_cnt > best_cnt:
-            best_cnt = success_cnt
-            best_idxs = list(selected)
-            if best_cnt >= target_threshold:
-                break
-                
-    return best_cnt, best_idxs
+    cols = list(cols)
+    base = pd.DataFrame({c: _sorted_categorical(quota_scoring.normalized(_df, c, _cache)) for c in cols})
+    return base.groupby(cols, observed=False).size().unstack(fill_value=0)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def simple_counts(data_sig, _df, cols, _cache=None):
+    """
+    단순형 값별 현재 인원 (여러 변수는 값을 합산, 빈 응답은 "" 로 집계)
+    반환: 값 / 현재 / 목표(= 현재) DataFrame, 값 자연 정렬
+    """
+    vals = pd.concat([quota_scoring.normalized(_df, c, _cache) for c in cols], ignore_index=True)
+    cnt = vals.value_counts(sort=False).rename_axis('값').reset_index(name='현재')
+    cnt['목표'] = cnt['현재']
+    return cnt.iloc[sorted(range(len(cnt)), key=lambda i: natural_key(cnt['값'].iat[i]))].reset_index(drop=True)